@@ -0,0 +1,177 @@
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+import rank
+
+# Build a synthetic chat shaped like a Telegram export: mostly hashtagged messages,
+# some plain text and an occasional topic_created service message
+def make_messages(count, seed=0):
+    rng = random.Random(seed)
+    hashtags = ['#FIVE', '#four', '#Three', '#FM', '#ffm', '#ORGY', '#solo', '#misc']
+    start = datetime(2020, 1, 1)
+    messages = []
+    for message_id in range(1, count + 1):
+        date = (start + timedelta(minutes=message_id)).isoformat()
+        if rng.random() < 0.05:
+            messages.append({'id': message_id, 'type': 'service', 'date': date, 'action': 'topic_created', 'title': f'Title {message_id}'})
+        elif rng.random() < 0.7:
+            text = ['Scene ', {'type': 'hashtag', 'text': rng.choice(hashtags)}, ' ', {'type': 'hashtag', 'text': rng.choice(hashtags)}]
+            messages.append({'id': message_id, 'type': 'message', 'date': date, 'text': text})
+        else:
+            messages.append({'id': message_id, 'type': 'message', 'date': date, 'text': f'Message {message_id}'})
+    return messages
+
+# Per-chat aggregation as rank.py did it before ChatAggregator: one scan each for the
+# message count, hashtag counts, newest date and topic titles
+def multi_pass(messages):
+    total_messages = sum(1 for msg in messages if msg.get('type') == 'message')
+    hashtag_counts = {}
+    for message in messages:
+        if message.get('type') == 'message':
+            text = message.get('text', '')
+            if isinstance(text, list):
+                for entity in text:
+                    if isinstance(entity, dict) and entity.get('type') == 'hashtag':
+                        hashtag = entity.get('text')
+                        if hashtag:
+                            hashtag_upper = hashtag.upper()
+                            if hashtag_upper in rank.special_ratings + rank.special_scene_types:
+                                hashtag = hashtag_upper
+                            hashtag_counts[hashtag] = hashtag_counts.get(hashtag, 0) + 1
+    dates = []
+    for message in messages:
+        if message.get('type') == 'message':
+            date_str = message.get('date')
+            if date_str:
+                try:
+                    dates.append(datetime.fromisoformat(date_str))
+                except ValueError:
+                    continue
+    newest_date = max(dates) if dates else None
+    topics = []
+    for message in messages:
+        if message.get('action') == 'topic_created':
+            title = message.get('title', '')
+            message_id = message.get('id')
+            date_str = message.get('date', '')
+            if title.strip() and message_id and date_str:
+                try:
+                    date = datetime.fromisoformat(date_str).strftime('%Y-%m-%d')
+                except ValueError:
+                    continue
+                topics.append({'title': title, 'message_id': message_id, 'date': date})
+    return total_messages, hashtag_counts, newest_date, topics
+
+def single_pass(messages):
+    aggregator = rank.ChatAggregator()
+    aggregator.update(messages)
+    return aggregator.total_messages, aggregator.hashtag_counts, aggregator.newest_date, aggregator.topics
+
+# Best wall time of `repeat` runs of fn(*args), plus its last result
+def best_of(repeat, fn, *args):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+def bench_aggregate(args):
+    messages = make_messages(args.messages)
+    print(f"Aggregating a chat of {len(messages)} messages (best of {args.repeat})")
+    multi_time, multi_result = best_of(args.repeat, multi_pass, messages)
+    single_time, single_result = best_of(args.repeat, single_pass, messages)
+    if multi_result != single_result:
+        raise SystemExit("Error: single-pass and multi-pass aggregation disagree")
+    print(f"  multi-pass:  {multi_time:.3f}s")
+    print(f"  single-pass: {single_time:.3f}s")
+    print(f"  speedup:     {multi_time / single_time:.2f}x")
+
+# Synthetic titles for one group, shaped like the ones rank.py builds from created topics
+def make_titles(count):
+    return [{
+        'title': f'Title {serial_number}',
+        'message_id': serial_number * 7,
+        'date': f'2024-{serial_number % 12 + 1:02d}-{serial_number % 28 + 1:02d}',
+        'media_path': f'../Photos/Group/thumbs/{serial_number}.mp4',
+        'is_gif': serial_number % 10 == 0,
+        'serial_number': serial_number
+    } for serial_number in range(1, count + 1)]
+
+# Titles grid and table as the baseline rank.py built them (c646443, copied verbatim): strings
+# grown with += and interpolated into the page. The page shell is the same template for both
+# renderers, so only the title markup is compared.
+def render_concat(titles, values):
+    telegram_group_id = '1234'
+    titles_count = len(titles)
+
+    # Titles grid
+    titles_grid = f"<p>Total Titles: {titles_count}</p><div class='titles-grid' id='titlesGrid'>"
+    for t in titles:
+        media_element = (
+            f"<img src='{t['media_path']}' alt='Media for {t['title']}' style='width:100%;height:300px;object-fit:cover;border-radius:5px;'>"
+            if t['is_gif'] or t['media_path'] == 'https://via.placeholder.com/600x300'
+            else f"<video src='{t['media_path']}' style='width:100%;height:300px;object-fit:cover;border-radius:5px;' loop muted playsinline></video>"
+        )
+        titles_grid += f"""
+                <div class='grid-item'>
+                    {media_element}
+                    <p class='title'><a href='https://t.me/c/{telegram_group_id}/{t['message_id']}' target='_blank'>{t['title']}</a></p>
+                    <p class='date'>S.No: {t['serial_number']} | {t['date']}</p>
+                </div>
+            """
+    titles_grid += f"</div>" if titles else f"<p>No titles found (Total: {titles_count})</p>"
+
+    # Titles table
+    titles_table = f"<table class='titles-table' id='titlesTable'><thead><tr><th onclick='sortTitlesTable(0)'>S.No</th><th onclick='sortTitlesTable(1)'>Items</th><th onclick='sortTitlesTable(2)'>Date</th></tr></thead><tbody id='titlesTableBody'>"
+    for t in titles:
+        titles_table += f"<tr><td>{t['serial_number']}</td><td><a href='https://t.me/c/{telegram_group_id}/{t['message_id']}' target='_blank'>{t['title']}</a></td><td>{t['date']}</td></tr>"
+    titles_table += f"</tbody></table>" if titles else f"<p>No titles found</p>"
+    return rank.group_page_template.render(**values, titles_grid=titles_grid, titles_table=titles_table)
+
+def render_template(titles, values):
+    return rank.group_page_template.render(**values, titles_grid=rank.render_titles_grid(titles, '1234'), titles_table=rank.render_titles_table(titles, '1234'))
+
+# Markup rank.py has added to the title grid since the baseline: lazily loaded media
+def strip_later_markup(html):
+    return html.replace(" loading='lazy' decoding='async'", '').replace("<video data-src=", '<video src=').replace(" preload='none'", '')
+
+def bench_render(args):
+    titles = make_titles(args.titles)
+    # Every field the group template takes gets a value, so fields added to the page later don't
+    # break the benchmark; the titles grid and table are filled in by the renderers
+    values = dict.fromkeys(rank.group_page_template.field_names, '')
+    del values['titles_grid'], values['titles_table']
+    values.update({
+        'group_name': 'Group', 'rank': 1, 'column_width': 100, 'slideshow_content': '', 'total_messages': 0, 'date_diff_text': 'N/A',
+        'ratings_hashtag_list': '', 'scene_types_hashtag_list': '', 'other_hashtag_list': '', 'history_data_json': '[]',
+        'suggested_max': 2, 'group_css': 'assets/group.css', 'group_js': 'assets/group.js'
+    })
+    print(f"Rendering a group page with {len(titles)} titles (best of {args.repeat})")
+    concat_time, concat_html = best_of(args.repeat, render_concat, titles, values)
+    template_time, template_html = best_of(args.repeat, render_template, titles, values)
+    if concat_html != strip_later_markup(template_html):
+        raise SystemExit("Error: template and baseline renderers disagree")
+    print(f"  baseline +=:   {concat_time:.3f}s")
+    print(f"  template:      {template_time:.3f}s")
+    print(f"  speedup:       {concat_time / template_time:.2f}x")
+
+def main():
+    parser = argparse.ArgumentParser(description='Micro-benchmarks for rank.py.')
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    aggregate_parser = subparsers.add_parser('aggregate', help='Per-chat message aggregation')
+    aggregate_parser.add_argument('--messages', type=int, default=500000, help='Messages in the synthetic chat (default: 500000)')
+    aggregate_parser.add_argument('--repeat', type=int, default=3, help='Runs per variant, best time is reported (default: 3)')
+    aggregate_parser.set_defaults(func=bench_aggregate)
+    render_parser = subparsers.add_parser('render', help='Group page rendering')
+    render_parser.add_argument('--titles', type=int, default=10000, help='Titles in the synthetic group (default: 10000)')
+    render_parser.add_argument('--repeat', type=int, default=5, help='Runs per variant, best time is reported (default: 5)')
+    render_parser.set_defaults(func=bench_render)
+    args = parser.parse_args()
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
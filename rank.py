@@ -1,13 +1,41 @@
+import argparse
+import collections
+import hashlib
 import json
 import csv
+import gzip
+import io
+import logging
+import math
 import os
 import shutil
+import sqlite3
+import sys
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
 import re
 import zipfile
-import random
 from html import escape
 
+import scoring
+
+# resource gives peak memory on Unix; elsewhere the build report leaves it out
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Pillow is optional: without it pages reference the original photos instead of resized derivatives
+try:
+    from PIL import Image, ImageOps, features as pil_features
+except ImportError:
+    Image = None
+
+# Progress goes through this logger: per-stage summaries at INFO, per-file and per-group detail at DEBUG
+logger = logging.getLogger('rank')
+
 # Define folder paths
 input_folder = 'PS'
 output_folder = 'docs'
@@ -15,80 +43,353 @@ html_subfolder = os.path.join(output_folder, 'HTML')
 photos_folder = 'Photos'
 docs_photos_folder = os.path.join(output_folder, 'Photos')
 history_csv_file = os.path.join(output_folder, 'history.csv')
+cache_folder = os.path.join(output_folder, '.cache')
+photos_manifest_file = os.path.join(cache_folder, 'photos_manifest.json')
+aggregate_cache_file = os.path.join(cache_folder, 'chat_aggregates.json')
+output_manifest_file = os.path.join(cache_folder, 'output_manifest.json')
+history_db_file = os.path.join(cache_folder, 'history.sqlite')
+assets_folder = os.path.join(output_folder, 'assets')
+api_folder = os.path.join(output_folder, 'api')
+derived_folder = os.path.join(output_folder, 'derived')
+derivatives_manifest_file = os.path.join(cache_folder, 'derivatives.json')
+build_report_file = os.path.join(output_folder, '.build', 'report.json')
+api_groups_folder = os.path.join(api_folder, 'groups')
+
+# Folder of docs/Photos/ holding every published file under --dedup-media
+blobs_folder_name = 'blobs'
+
+# Short sides, in pixels, of the resized derivatives made of each cover and slideshow photo
+derivative_sizes = (150, 300, 600)
+
+# Bump when ChatAggregator's output changes so stale cached aggregates are discarded
+aggregate_cache_version = 1
 
 # Define CSV output path
 csv_file = os.path.join(output_folder, 'output.csv')
 
-# Ensure directories exist
-for folder in [input_folder, output_folder, html_subfolder, photos_folder]:
-    if not os.path.exists(folder):
-        os.makedirs(folder)
-        print(f"Created directory: {folder}")
-    else:
-        print(f"Directory already exists: {folder}")
-
-# Copy Photos/ to docs/Photos/
-if os.path.exists(photos_folder):
-    if os.path.exists(docs_photos_folder):
-        shutil.rmtree(docs_photos_folder)
-    shutil.copytree(photos_folder, docs_photos_folder)
-    print(f"Copied {photos_folder}/ to {docs_photos_folder}/")
-else:
-    os.makedirs(docs_photos_folder)
-    print(f"Created empty {docs_photos_folder}/ (no photos found in {photos_folder}/)")
-
-# Path to result.zip
-zip_file = os.path.join(input_folder, 'result.zip')
-temp_json_file = os.path.join(input_folder, 'result.json')
-
-# Verify ZIP file existence and extract result.json
-if not os.path.exists(zip_file):
-    print(f"Error: 'result.zip' not found in '{input_folder}'. Exiting.")
-    exit(1)
-
-print(f"Extracting {zip_file}")
-try:
-    with zipfile.ZipFile(zip_file, 'r') as zip_ref:
-        json_found = False
-        for file_info in zip_ref.infolist():
-            if file_info.filename.endswith('result.json'):
-                zip_ref.extract(file_info, input_folder)
-                extracted_path = os.path.join(input_folder, file_info.filename)
-                if extracted_path != temp_json_file:
-                    shutil.move(extracted_path, temp_json_file)
-                json_found = True
-                print(f"Extracted 'result.json' to {temp_json_file}")
-                break
-        if not json_found:
-            print(f"Error: 'result.json' not found in '{zip_file}'. Exiting.")
-            exit(1)
-except zipfile.BadZipFile:
-    print(f"Error: '{zip_file}' is not a valid ZIP file. Exiting.")
-    exit(1)
-
-# Verify extracted file existence
-if not os.path.exists(temp_json_file):
-    print(f"Error: Failed to extract 'result.json' from '{zip_file}'. Exiting.")
-    exit(1)
-
-# Load JSON data
-print(f"Loading {temp_json_file}")
-with open(temp_json_file, 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
-# Clean up the temporary JSON file
-try:
-    os.remove(temp_json_file)
-    print(f"Removed temporary file: {temp_json_file}")
-except OSError as e:
-    print(f"Warning: Could not remove {temp_json_file}: {e}")
-
-# Access chats list
-chats = data.get('chats', {}).get('list', [])
-print(f"Found {len(chats)} chats in result.json")
-if not chats:
-    print("No chats found in 'result.json'. Exiting.")
-    exit(1)
+# Function to hash a file's contents without reading it into memory at once
+def file_sha256(path, chunk_size=1 << 20):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+# Function to publish src at dst, sharing storage with the source when the mode allows it
+def publish_file(src, dst, mode='copy'):
+    if os.path.lexists(dst):
+        os.remove(dst)  # Never write through an old hardlink into the source tree
+    if mode == 'hardlink':
+        try:
+            os.link(src, dst)
+            return
+        except OSError:
+            pass  # Different filesystem or unsupported, fall back to a copy
+    elif mode == 'reflink':
+        try:
+            import fcntl
+            with open(src, 'rb') as fsrc, open(dst, 'wb') as fdst:
+                fcntl.ioctl(fdst.fileno(), 0x40049409, fsrc.fileno())  # FICLONE
+            shutil.copystat(src, dst)
+            return
+        except (ImportError, OSError):
+            pass  # No copy-on-write support, fall back to a copy
+    shutil.copy2(src, dst)
+
+# Function to load a JSON manifest from the cache folder, starting over if it is missing or unreadable
+def load_manifest(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Warning: Ignoring unreadable manifest %s: %s", path, e)
+        return {}
+
+# Function to write a generated text file only when its content changed. The manifest maps each
+# written path to [size, sha256] so an unchanged file costs one stat; without an entry the file
+# on disk is read and compared instead. Content is text or bytes. Returns True if the file was written.
+def write_if_changed(path, content, manifest):
+    data = content.encode('utf-8') if isinstance(content, str) else content
+    digest = hashlib.sha256(data).hexdigest()
+    try:
+        size = os.path.getsize(path)
+    except OSError:
+        size = None
+    if size == len(data):
+        if manifest.get(path) == [size, digest]:
+            return False
+        if path not in manifest:
+            with open(path, 'rb') as f:
+                if f.read() == data:
+                    manifest[path] = [size, digest]
+                    return False
+    with open(path, 'wb') as f:
+        f.write(data)
+    manifest[path] = [len(data), digest]
+    return True
+
+# Function to publish a static asset as docs/assets/<name>.<hash>.<ext>, so pages can reference it
+# and browsers can cache it indefinitely. Older hashed versions of the asset are removed.
+# Returns the asset's path relative to docs/.
+def publish_asset(name, ext, content, manifest):
+    digest = hashlib.sha256(content.encode('utf-8')).hexdigest()[:12]
+    file_name = f"{name}.{digest}.{ext}"
+    os.makedirs(assets_folder, exist_ok=True)
+    if write_if_changed(os.path.join(assets_folder, file_name), content, manifest):
+        logger.debug("Wrote asset: %s", file_name)
+    stale_re = re.compile(rf'{re.escape(name)}\.[0-9a-f]{{12}}\.{re.escape(ext)}')
+    for old_name in os.listdir(assets_folder):
+        if old_name != file_name and stale_re.fullmatch(old_name):
+            old_path = os.path.join(assets_folder, old_name)
+            os.remove(old_path)
+            manifest.pop(old_path, None)
+            logger.debug("Removed stale asset: %s", old_name)
+    return f"assets/{file_name}"
+
+# Function to catalog a directory tree in a single os.scandir pass. Returns a dict mapping every
+# directory (relative to root, '' for root itself) to {file name: (size, mtime_ns)} in directory
+# order, so later lookups are answered from memory instead of listdir/isfile/exists calls.
+def build_media_catalog(root):
+    catalog = {}
+    pending = ['']
+    while pending:
+        rel_dir = pending.pop()
+        files = catalog[rel_dir] = {}
+        try:
+            with os.scandir(os.path.join(root, rel_dir)) as entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        pending.append(os.path.join(rel_dir, entry.name))
+                    elif entry.is_file():
+                        entry_stat = entry.stat()
+                        files[entry.name] = (entry_stat.st_size, entry_stat.st_mtime_ns)
+        except FileNotFoundError:
+            del catalog[rel_dir]
+    return catalog
+
+# Function to incrementally mirror the catalogued src_root into dst_root. A manifest of
+# (size, mtime, sha256) per file means unchanged files are not read at all, changed files are
+# copied and files that disappeared from the source are deleted. Naming 'hashed' publishes every
+# file except fixed_photo_names as <sha256 prefix><ext> in its own folder, so a published name
+# never changes content and identical files in a folder are published once; 'dedup' publishes
+# every file except fixed_photo_names that way in the shared blobs_folder_name folder, so
+# identical files anywhere are published once. Returns the counts, the bytes not published thanks
+# to deduplication and a dict mapping the source-relative path of every renamed file to its
+# published path.
+def sync_tree(catalog, src_root, dst_root, manifest_file, mode='copy', naming='original'):
+    manifest = load_manifest(manifest_file)
+    published_catalog = build_media_catalog(dst_root)
+    new_manifest = {}
+    published_names = {}
+    expected = set()
+    copied = unchanged = deleted = saved_bytes = 0
+    for rel_dir, files in catalog.items():
+        for name, (size, mtime_ns) in files.items():
+            rel = os.path.join(rel_dir, name)
+            entry = manifest.get(rel)
+            if entry and entry[0] == size and entry[1] == mtime_ns:
+                digest = entry[2]
+                same_content = True
+            else:
+                digest = file_sha256(os.path.join(src_root, rel))
+                same_content = bool(entry) and entry[2] == digest  # Touched but identical content
+            new_manifest[rel] = [size, mtime_ns, digest]
+            hashed_name = f"{digest[:16]}{os.path.splitext(name)[1].lower()}"
+            if naming == 'dedup' and (rel_dir or name not in fixed_photo_names):
+                published_rel = os.path.join(blobs_folder_name, hashed_name)
+            elif naming == 'hashed' and (rel_dir or name not in fixed_photo_names):
+                published_rel = os.path.join(rel_dir, hashed_name)
+            else:
+                published_rel = rel
+            if published_rel != rel:
+                published_names[rel] = published_rel
+                same_content = True  # The name itself pins the content
+            if published_rel in expected:
+                unchanged += 1
+                saved_bytes += size  # Identical to a file already published under this name
+                continue
+            expected.add(published_rel)
+            published_dir, published_name = os.path.split(published_rel)
+            published_files = published_catalog.get(published_dir, {})
+            if same_content and published_name in published_files and published_files[published_name][0] == size:
+                unchanged += 1
+                continue
+            dst = os.path.join(dst_root, published_rel)
+            os.makedirs(os.path.dirname(dst), exist_ok=True)
+            publish_file(os.path.join(src_root, rel), dst, mode)
+            copied += 1
+    for rel_dir, published_files in published_catalog.items():
+        for name in published_files:
+            if os.path.join(rel_dir, name) not in expected:
+                os.remove(os.path.join(dst_root, rel_dir, name))
+                deleted += 1
+    for rel_dir in sorted(published_catalog, key=len, reverse=True):
+        if rel_dir:
+            try:
+                os.rmdir(os.path.join(dst_root, rel_dir))
+            except OSError:
+                pass  # Not empty
+    with open(manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(new_manifest, f)
+    return copied, unchanged, deleted, saved_bytes, published_names
+
+# Function to save resized copies of an image into derived_folder, one per derivative size its
+# short side can fill (at least one, never upscaled). JPEGs are decoded at a reduced scale that
+# still fills the largest size, and each smaller size is resized from the one above it rather
+# than from the original. Returns [[short side, file name], ...], smallest first.
+def make_derivatives(path, digest, ext, image_format):
+    entries = []
+    with Image.open(path) as source:
+        short_side = min(source.size)
+        sizes = [derivative_sizes[0]] + [size for size in derivative_sizes[1:] if size <= short_side]
+        if source.format == 'JPEG' and short_side > sizes[-1]:
+            scale = sizes[-1] / short_side
+            source.draft(None, (math.ceil(source.width * scale), math.ceil(source.height * scale)))
+        image = ImageOps.exif_transpose(source)
+        if image_format == 'WEBP' and image.mode not in ('RGB', 'RGBA'):
+            image = image.convert('RGBA')  # Also keeps palette transparency
+        elif image_format == 'JPEG' and image.mode != 'RGB':
+            image = image.convert('RGB')
+        for size in reversed(sizes):
+            scale = min(1, size / min(image.size))
+            if scale < 1:
+                image = image.resize((max(1, round(image.width * scale)), max(1, round(image.height * scale))), Image.LANCZOS)
+            name = f"{digest[:20]}-{size}.{ext}"
+            image.save(os.path.join(derived_folder, name), image_format, quality=80, method=2)  # Faster WebP encoding, JPEG ignores it
+            entries.insert(0, [min(image.size), name])
+    return entries
+
+# Function to make resized derivatives of the cover photos in Photos/ and the slideshow photos in
+# its group folders. They're named and cached by the source's content hash (from the sync
+# manifest), so a photo is only resized again when it changes; derivatives of photos that are
+# gone are removed. Returns a dict mapping each photo's path under Photos/ to its derivatives,
+# smallest first, or {} when Pillow is not installed.
+def build_derivatives(catalog, src_root, photos_manifest):
+    if Image is None:
+        logger.info("Pillow is not installed; pages reference the original photos")
+        return {}
+    ext, image_format = ('webp', 'WEBP') if pil_features.check('webp') else ('jpg', 'JPEG')
+    cache = load_manifest(derivatives_manifest_file)
+    new_cache = {}
+    derivatives = {}
+    resized = reused = 0
+    os.makedirs(derived_folder, exist_ok=True)
+    for rel_dir, files in catalog.items():
+        if os.path.dirname(rel_dir):
+            continue  # Only Photos/ itself and its group folders hold covers and slideshow photos
+        for name in files:
+            if not name.lower().endswith(photo_extensions) or name.lower().endswith('.gif'):
+                continue
+            rel = os.path.join(rel_dir, name)
+            digest = photos_manifest[rel][2]
+            entries = cache.get(f"{digest}.{ext}")
+            if entries and all(os.path.exists(os.path.join(derived_folder, entry[1])) for entry in entries):
+                reused += 1
+            else:
+                try:
+                    entries = make_derivatives(os.path.join(src_root, rel), digest, ext, image_format)
+                except (OSError, ValueError, SyntaxError, Image.DecompressionBombError) as e:
+                    # Unreadable, corrupt or oversized images keep the original photo
+                    logger.warning("Warning: Could not resize %s, using the original: %s", rel, e)
+                    continue
+                resized += 1
+            new_cache[f"{digest}.{ext}"] = entries
+            derivatives[rel] = entries
+    keep = {entry[1] for entries in new_cache.values() for entry in entries}
+    for name in os.listdir(derived_folder):
+        if name not in keep:
+            os.remove(os.path.join(derived_folder, name))
+    with open(derivatives_manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(new_cache, f)
+    logger.info("Derivatives in %s/: %d photos resized, %d reused", derived_folder, resized, reused)
+    return derivatives
+
+# Function to choose the image for a photo shown display_width pixels wide: the smallest
+# derivative that fills it, plus a srcset with the one that fills it at 2x. Paths are relative to
+# docs/ unless a prefix is given; without derivatives the published photo and no srcset are used.
+def responsive_photo(rel_path, display_width, derivatives, media_names, prefix=''):
+    entries = derivatives.get(rel_path)
+    if not entries:
+        return f"{prefix}{published_photo(rel_path, media_names)}", ''
+    def pick(width):
+        return next((name for short_side, name in entries if short_side >= width), entries[-1][1])
+    src, src_2x = pick(display_width), pick(2 * display_width)
+    srcset = f"{prefix}derived/{src} 1x, {prefix}derived/{src_2x} 2x" if src_2x != src else ''
+    return f"{prefix}derived/{src}", srcset
+
+# Function to give the path, relative to docs/, a file under Photos/ is published at
+def published_photo(rel_path, media_names):
+    return f"Photos/{media_names.get(rel_path, rel_path)}"
+
+def srcset_attr(srcset):
+    return f' srcset="{srcset}"' if srcset else ''
+
+# Regexes used by the streaming JSON reader
+json_token_re = re.compile(r'["{}\[\]:]')
+json_string_re = re.compile(r'"(?:[^"\\]|\\.)*"', re.S)
+
+# Function to stream the elements of a JSON array nested under the object keys in `path`.
+# Only the element currently being yielded is held in memory, so a multi-GB export
+# is bounded by its largest chat instead of its total size.
+def iter_json_array(f, path, chunk_size=1 << 20):
+    decoder = json.JSONDecoder()
+    target = list(path)
+    buf, pos, eof = '', 0, False
+    stack = []  # Open containers as [bracket, key it was opened under]
+    pending_key = None
+    last_string = None
+    expected_size = 0  # Length of the last element yielded; chats tend to be of similar size
+    while True:
+        m = json_token_re.search(buf, pos)
+        token = m.group() if m else None
+        if token == '"':
+            string_match = json_string_re.match(buf, m.start())
+            if string_match:
+                last_string = json.loads(string_match.group())
+                pos = string_match.end()
+                continue
+        elif token in ('{', '[') and stack and stack[-1][0] == '[' and [key for _, key in stack[1:]] == target:
+            # A failed decode costs as much as a successful one, so it is only tried once the
+            # buffer holds at least as much as the last element did
+            if eof or len(buf) - m.start() >= expected_size:
+                try:
+                    item, pos = decoder.raw_decode(buf, m.start())
+                except json.JSONDecodeError:
+                    if eof:
+                        raise
+                else:
+                    expected_size = pos - m.start()
+                    yield item
+                    del item
+                    continue
+        elif token in ('{', '['):
+            stack.append([token, pending_key if stack and stack[-1][0] == '{' else None])
+            pending_key = None
+            pos = m.end()
+            continue
+        elif token in ('}', ']'):
+            stack.pop()
+            if not stack:
+                return
+            pos = m.end()
+            continue
+        elif token == ':':
+            pending_key = last_string
+            pos = m.end()
+            continue
+        # The next token is incomplete or missing: read more, growing the buffer geometrically
+        # so an element spanning many chunks is only re-decoded O(log n) times, and reading at
+        # least as much as the last element held so one of similar size is decoded only once
+        if eof:
+            if stack:
+                raise ValueError("Unexpected end of JSON input")
+            return
+        start = m.start() if m else len(buf)
+        chunk = f.read(max(chunk_size, len(buf) - start, expected_size))
+        eof = not chunk
+        buf, pos = buf[start:] + chunk, 0
 
 # Define CSV columns
 csv_columns = [
@@ -103,37 +404,10 @@ csv_columns = [
 # Define history CSV columns
 history_columns = ['date', 'group name', 'rank']
 
-# Load existing history data
-history_data = {}
-current_date = datetime.now().strftime('%Y-%m-%d')
-if os.path.exists(history_csv_file):
-    with open(history_csv_file, 'r', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            group = row.get('group name', 'Unknown')
-            date = row.get('date', '')
-            try:
-                rank = int(row.get('rank', '0'))
-                if group not in history_data:
-                    history_data[group] = {}
-                if date != current_date:  # Exclude current date entries
-                    # Store entries by date, keep the lowest (highest-ranking) rank
-                    if date not in history_data[group] or rank < history_data[group][date]['rank']:
-                        history_data[group][date] = {'date': date, 'rank': rank}
-            except (ValueError, TypeError) as e:
-                print(f"Skipping invalid rank for group '{group}' on date '{date}': {row}. Error: {e}")
-    # Convert history_data[group] from dict to list
-    for group in history_data:
-        history_data[group] = list(history_data[group].values())
-        history_data[group].sort(key=lambda x: x['date'])  # Sort by date for chart
-    print(f"Loaded {sum(len(v) for v in history_data.values())} history entries from {history_csv_file}")
-else:
-    print(f"No existing {history_csv_file} found")
-
-# Initialize data storage
-all_data = []
-max_messages = 0
-date_diffs = []
+# Hashtags that are normalized to upper case and shown in their own sections
+special_ratings = ['#FIVE', '#FOUR', '#THREE']
+special_scene_types = ['#FM', '#FF', '#FFM', '#FFFM', '#FFFFM', '#FMM', '#FMMM', '#FMMMM', '#FFMM', '#FFFMMM', '#ORGY']
+special_hashtags = frozenset(special_ratings + special_scene_types)
 
 # Function to sanitize filenames
 def sanitize_filename(name):
@@ -141,394 +415,862 @@ def sanitize_filename(name):
     name = re.sub(r'\s+', '_', name)
     return name.lower()
 
+# Photo extensions used for slideshows, fallback thumbnails and the single cover photo (in that order of preference)
+photo_extensions = ('.jpg', '.jpeg', '.png', '.gif', '.webp')
+
+# Files at the top of Photos/ that pages and the index script reference by name, so they are
+# never renamed when publishing
+fixed_photo_names = ('up.png', 'down.png', '0.png')
+
+# Thumbs media extensions, in order of precedence when one serial number has several files
+media_extensions = ['.mp4', '.webm', '.ogg', '.gif']
+
+# Function to index thumbs media files by serial number (the file name without extension).
+# When e.g. 3.mp4, 3.webm and 3.gif all exist the earliest extension in media_extensions wins.
+def build_media_index(media_files):
+    media_index = {}
+    for media in sorted(media_files, key=lambda f: (media_extensions.index(os.path.splitext(f)[1].lower()), f)):
+        media_index.setdefault(os.path.splitext(media)[0], media)
+    return media_index
+
+# Function to pick a fallback photo for a title that has no thumbs media. Rendezvous hashing on
+# the group and message ids gives the same pick on every run, and adding or removing a photo only
+# moves the titles that now prefer (or had picked) that photo.
+def pick_fallback_photo(group_id, message_id, fallback_photos):
+    key = f"{group_id}:{message_id}:"
+    return max(fallback_photos, key=lambda photo: hashlib.blake2b((key + photo).encode('utf-8'), digest_size=8).digest())
+
 # Function to find media file by serial number
-def find_serial_match_media(serial_number, media_files):
-    print(f"Searching for serial number '{serial_number}' in media files: {media_files}")
-    for media in media_files:
-        media_base = os.path.splitext(media)[0]
-        if media_base == str(serial_number):
-            print(f"Match found for serial number '{serial_number}': '{media}'")
-            return media
-    print(f"No match found for serial number '{serial_number}'")
-    return None
-
-# Process each chat
-for chat in chats:
-    if chat.get('type') == 'private_supergroup':
-        group_name = chat.get('name', 'Unknown Group')
-        group_id = str(chat['id'])
-        telegram_group_id = group_id[4:] if group_id.startswith('-100') else group_id
-        messages = chat.get('messages', [])
-        print(f"Processing group: {group_name} (ID: {group_id})")
-
-        total_messages = sum(1 for msg in messages if msg.get('type') == 'message')
-        max_messages = max(max_messages, total_messages)
-
-        # Hashtag counting
-        hashtag_counts = {}
+def find_serial_match_media(serial_number, media_index):
+    return media_index.get(str(serial_number))
+
+# Single-pass aggregator over a chat's messages. Message count, hashtag counts, newest
+# message date and topic titles are collected together, so each message is looked at
+# exactly once and messages can come from a streaming source.
+class ChatAggregator:
+    def __init__(self):
+        self.total_messages = 0
+        self.hashtag_counts = {}
+        self.newest_date = None
+        self.topics = []  # Created topics in message order, as {'title', 'message_id', 'date'}
+
+    def update(self, messages):
+        hashtag_counts = self.hashtag_counts
+        total_messages = self.total_messages
+        newest_date = self.newest_date
+        fromisoformat = datetime.fromisoformat
         for message in messages:
             if message.get('type') == 'message':
-                text = message.get('text', '')
+                total_messages += 1
+                text = message.get('text')
                 if isinstance(text, list):
                     for entity in text:
                         if isinstance(entity, dict) and entity.get('type') == 'hashtag':
                             hashtag = entity.get('text')
                             if hashtag:
                                 hashtag_upper = hashtag.upper()
-                                special_ratings = ['#FIVE', '#FOUR', '#THREE']
-                                special_scene_types = ['#FM', '#FF', '#FFM', '#FFFM', '#FFFFM', '#FMM', '#FMMM', '#FMMMM', '#FFMM', '#FFFMMM', '#ORGY']
-                                if hashtag_upper in special_ratings + special_scene_types:
+                                if hashtag_upper in special_hashtags:
                                     hashtag = hashtag_upper
                                 hashtag_counts[hashtag] = hashtag_counts.get(hashtag, 0) + 1
-
-        # Calculate date_diff
-        dates = []
-        for message in messages:
-            if message.get('type') == 'message':
                 date_str = message.get('date')
                 if date_str:
                     try:
-                        date = datetime.fromisoformat(date_str)
-                        dates.append(date)
+                        date = fromisoformat(date_str)
                     except ValueError:
                         continue
-        date_diff = None
-        if dates:
-            newest_date = max(dates)
-            today = datetime.now()
-            date_diff = (today - newest_date).days
-            date_diffs.append(date_diff)
-        print(f"Group {group_name}: Total messages = {total_messages}, Date diff = {date_diff}")
-
-        # Hashtag lists
-        special_ratings = ['#FIVE', '#FOUR', '#THREE']
-        special_scene_types = ['#FM', '#FF', '#FFM', '#FFFM', '#FFFFM', '#FMM', '#FMMM', '#FMMMM', '#FFMM', '#FFFMMM', '#ORGY']
-        ratings_hashtag_list = ''.join(f'<li class="hashtag-item">{h}: {hashtag_counts[h]}</li>\n' for h in sorted(hashtag_counts) if h in special_ratings) or '<li>No rating hashtags (#FIVE, #FOUR, #Three) found</li>'
-        scene_types_hashtag_list = ''.join(f'<li class="hashtag-item">{h}: {hashtag_counts[h]}</li>\n' for h in sorted(hashtag_counts) if h in special_scene_types) or '<li>No scene type hashtags found</li>'
-        other_hashtag_list = ''.join(f'<li class="hashtag-item">{h}: {hashtag_counts[h]}</li>\n' for h in sorted(hashtag_counts) if h not in special_ratings and h not in special_scene_types) or '<li>No other hashtags found</li>'
-
-        scene_type_count = sum(hashtag_counts.get(h, 0) for h in special_scene_types)
-        date_diff_text = f'{date_diff} days' if date_diff is not None else 'N/A'
-
-        # Titles with serial numbers
-        titles = []
-        media_extensions = ['.mp4', '.webm', '.ogg', '.gif']
-        group_subfolder = os.path.join(docs_photos_folder, group_name)
-        thumbs_subfolder = os.path.join(group_subfolder, 'thumbs')
-        media_files = [f for f in os.listdir(thumbs_subfolder) if f.lower().endswith(tuple(media_extensions))] if os.path.exists(thumbs_subfolder) else []
-        fallback_photos = [f for f in os.listdir(group_subfolder) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')) and os.path.isfile(os.path.join(group_subfolder, f))] if os.path.exists(group_subfolder) else []
-        print(f"Group {group_name}: Thumbs media files = {media_files}, Fallback photos = {fallback_photos}")
-        serial_number = 1
-        for message in messages:
-            if message.get('action') == 'topic_created':
+                    if newest_date is None or date > newest_date:
+                        newest_date = date
+            elif message.get('action') == 'topic_created':
                 title = message.get('title', '')
                 message_id = message.get('id')
                 date_str = message.get('date', '')
                 if title.strip() and message_id and date_str:
                     try:
-                        date = datetime.fromisoformat(date_str).strftime('%Y-%m-%d')
-                        media_path = 'https://via.placeholder.com/600x300'
-                        is_gif = False
-                        if media_files:
-                            serial_match = find_serial_match_media(serial_number, media_files)
-                            if serial_match:
-                                media_path = f"../Photos/{group_name}/thumbs/{serial_match}"
-                                is_gif = serial_match.lower().endswith('.gif')
-                                print(f"Group {group_name}, Title '{title}' (S.No {serial_number}): Matched media '{serial_match}', selected path {media_path}")
-                        else:
-                            print(f"Group {group_name}, Title '{title}' (S.No {serial_number}): No media files in {thumbs_subfolder}")
-                            if fallback_photos:
-                                random_photo = random.choice(fallback_photos)
-                                media_path = f"../Photos/{group_name}/{random_photo}"
-                                is_gif = random_photo.lower().endswith('.gif')
-                                print(f"  Using fallback photo: {media_path}")
-                        titles.append({
-                            'title': title,
-                            'message_id': message_id,
-                            'date': date,
-                            'media_path': media_path,
-                            'is_gif': is_gif,
-                            'serial_number': serial_number
-                        })
-                        serial_number += 1
+                        date = fromisoformat(date_str).strftime('%Y-%m-%d')
                     except ValueError:
                         continue
-        titles.sort(key=lambda x: x['date'], reverse=True)  # Sort by date, newest first
-        titles_count = len(titles)
-
-        # Titles grid
-        titles_grid = f"<p>Total Titles: {titles_count}</p><div class='titles-grid' id='titlesGrid'>"
-        for t in titles:
-            media_element = (
-                f"<img src='{t['media_path']}' alt='Media for {t['title']}' style='width:100%;height:300px;object-fit:cover;border-radius:5px;'>"
-                if t['is_gif'] or t['media_path'] == 'https://via.placeholder.com/600x300'
-                else f"<video src='{t['media_path']}' style='width:100%;height:300px;object-fit:cover;border-radius:5px;' loop muted playsinline></video>"
-            )
-            titles_grid += f"""
-                <div class='grid-item'>
-                    {media_element}
-                    <p class='title'><a href='https://t.me/c/{telegram_group_id}/{t['message_id']}' target='_blank'>{t['title']}</a></p>
-                    <p class='date'>S.No: {t['serial_number']} | {t['date']}</p>
-                </div>
-            """
-        titles_grid += f"</div>" if titles else f"<p>No titles found (Total: {titles_count})</p>"
-
-        # Titles table
-        titles_table = f"<table class='titles-table' id='titlesTable'><thead><tr><th onclick='sortTitlesTable(0)'>S.No</th><th onclick='sortTitlesTable(1)'>Items</th><th onclick='sortTitlesTable(2)'>Date</th></tr></thead><tbody id='titlesTableBody'>"
-        for t in titles:
-            titles_table += f"<tr><td>{t['serial_number']}</td><td><a href='https://t.me/c/{telegram_group_id}/{t['message_id']}' target='_blank'>{t['title']}</a></td><td>{t['date']}</td></tr>"
-        titles_table += f"</tbody></table>" if titles else f"<p>No titles found</p>"
-
-        # Photos for slideshow
-        photo_paths = []
-        if os.path.exists(group_subfolder):
-            photo_paths = [f"../Photos/{group_name}/{f}" for f in os.listdir(group_subfolder) if f.lower().endswith(('.jpg', '.jpeg', '.png', '.gif', '.webp')) and os.path.isfile(os.path.join(group_subfolder, f))]
-            print(f"Group {group_name}: Found {len(photo_paths)} photos in {group_subfolder}: {photo_paths}")
-        if not photo_paths:
-            photo_paths = ['https://via.placeholder.com/1920x800']
-            print(f"Group {group_name}: Using placeholder for slideshow")
-
-        slideshow_content = '<div class="container">\n' + ''.join(f'<div class="mySlides"><div class="numbertext">{i} / {len(photo_paths)}</div><img src="{p}" style="width:100%;height:auto;"></div>' for i, p in enumerate(photo_paths, 1)) + """
-            <a class="prev" onclick="plusSlides(-1)">❮</a>
-            <a class="next" onclick="plusSlides(1)">❯</a>
-            <div class="caption-container"><p id="caption"></p></div>
-            <div class="row">
-        """ + ''.join(f'<div class="column"><img class="demo cursor" src="{p}" style="width:100%" onclick="currentSlide({i})" alt="{group_name} Photo {i}"></div>' for i, p in enumerate(photo_paths, 1)) + '</div></div>'
+                    self.topics.append({'title': title, 'message_id': message_id, 'date': date})
+        self.total_messages = total_messages
+        self.newest_date = newest_date
 
-        photo_file_name = next((f"{group_name}{ext}" for ext in ('.jpg', '.jpeg', '.png', '.gif', '.webp') if os.path.exists(os.path.join(docs_photos_folder, f"{group_name}{ext}"))), None)
-        if photo_file_name:
-            print(f"Group {group_name}: Found single photo at {docs_photos_folder}/{photo_file_name}")
+    def to_dict(self):
+        return {
+            'total_messages': self.total_messages,
+            'hashtag_counts': self.hashtag_counts,
+            'newest_date': self.newest_date.isoformat() if self.newest_date is not None else None,
+            'topics': self.topics
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        aggregator = cls()
+        aggregator.total_messages = data['total_messages']
+        aggregator.hashtag_counts = data['hashtag_counts']
+        aggregator.newest_date = datetime.fromisoformat(data['newest_date']) if data['newest_date'] else None
+        aggregator.topics = data['topics']
+        return aggregator
+
+# Function to load the per-chat aggregate cache, keyed by chat id
+def load_aggregate_cache(path):
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            cache = json.load(f)
+    except (OSError, ValueError) as e:
+        logger.warning("Warning: Ignoring unreadable aggregate cache %s: %s", path, e)
+        return {}
+    if cache.get('version') != aggregate_cache_version:
+        logger.info("Aggregate cache %s is from another version, rebuilding", path)
+        return {}
+    return cache.get('chats', {})
+
+# Function to save the per-chat aggregate cache
+def save_aggregate_cache(path, chats):
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'version': aggregate_cache_version, 'chats': chats}, f, ensure_ascii=False)
+
+# Function to aggregate a chat, reusing its cached aggregate when possible. Messages are in id
+# order, so the cache entry records the highest message id and its date plus how many messages
+# led up to it. If that prefix is still intact only the new tail is aggregated, and a chat with
+# no new messages is not aggregated at all. Returns (aggregator, new cache entry, status).
+def aggregate_chat(messages, cached=None):
+    aggregator = None
+    start = 0
+    if cached:
+        last_message_id = cached['last_message_id']
+        start = len(messages)
+        while start > 0 and messages[start - 1].get('id', 0) > last_message_id:
+            start -= 1
+        previous = messages[start - 1] if start else None
+        if (start == cached['message_count'] and previous is not None
+                and previous.get('id') == last_message_id and previous.get('date') == cached['last_date']):
+            aggregator = ChatAggregator.from_dict(cached['aggregate'])
+    if aggregator is None:
+        aggregator, start = ChatAggregator(), 0
+        status = 'full'
+    else:
+        status = 'unchanged' if start == len(messages) else f'{len(messages) - start} new messages'
+    if start < len(messages):
+        aggregator.update(messages[start:] if start else messages)
+    last = messages[-1] if messages else {}
+    entry = {
+        'last_message_id': last.get('id', 0),
+        'last_date': last.get('date'),
+        'message_count': len(messages),
+        'aggregate': aggregator.to_dict()
+    }
+    return aggregator, entry, status
+
+# Rank history kept in SQLite with an index on (group, date), so a run looks up each group's last
+# rank and chart series with indexed queries instead of re-reading all of history.csv.
+# history.csv stays the exported copy: the store imports it once, rebuilds from it whenever its
+# size differs from the size last seen, and writes it back out if it goes missing.
+class HistoryStore:
+    def __init__(self, db_path, csv_path):
+        self.csv_path = csv_path
+        self.conn = sqlite3.connect(db_path)
+        with self.conn:
+            self.conn.execute('CREATE TABLE IF NOT EXISTS history (group_name TEXT NOT NULL, date TEXT NOT NULL, rank INTEGER NOT NULL)')
+            self.conn.execute('CREATE INDEX IF NOT EXISTS history_group_date ON history (group_name, date)')
+            self.conn.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+        # history.csv is re-imported whenever its size or mtime differs from when the store last
+        # matched it, as in the Photos sync manifest
+        csv_stat = self.csv_stat()
+        if csv_stat is None:
+            if self.row_count():
+                self.export_csv(csv_path)
+                logger.info("Exported %d history rows from %s to missing %s", self.row_count(), db_path, csv_path)
+            else:
+                logger.info("No existing %s found", csv_path)
+        elif csv_stat != self.get_meta('csv_stat'):
+            imported = self.import_csv(csv_path)
+            logger.info("Imported %d history rows from %s into %s", imported, csv_path, db_path)
         else:
-            print(f"Group {group_name}: No single photo found in {docs_photos_folder}/")
+            logger.info("Loaded history store %s (%d rows)", db_path, self.row_count())
+
+    def get_meta(self, key):
+        row = self.conn.execute('SELECT value FROM meta WHERE key = ?', (key,)).fetchone()
+        return row[0] if row else None
+
+    def csv_stat(self):
+        if not os.path.exists(self.csv_path):
+            return None
+        stat = os.stat(self.csv_path)
+        return f'{stat.st_size}:{stat.st_mtime_ns}'
+
+    def record_csv_stat(self):
+        self.conn.execute('INSERT OR REPLACE INTO meta (key, value) VALUES (?, ?)', ('csv_stat', self.csv_stat()))
+
+    def row_count(self):
+        return self.conn.execute('SELECT COUNT(*) FROM history').fetchone()[0]
+
+    # Replace the stored history with the rows of a history CSV, skipping rows without a valid rank
+    def import_csv(self, path):
+        def rows(reader):
+            for row in reader:
+                group = row.get('group name', 'Unknown')
+                date = row.get('date', '')
+                try:
+                    yield group, date, int(row.get('rank', '0'))
+                except (ValueError, TypeError) as e:
+                    logger.debug("Skipping invalid rank for group '%s' on date '%s': %s. Error: %s", group, date, row, e)
+        with self.conn, open(path, 'r', encoding='utf-8') as f:
+            self.conn.execute('DELETE FROM history')
+            self.conn.executemany('INSERT INTO history (group_name, date, rank) VALUES (?, ?, ?)', rows(csv.DictReader(f)))
+            self.remove_duplicates()
+            self.record_csv_stat()
+        return self.row_count()
+
+    # Delete all but the lowest-rank row of every group's date; SQLite takes the bare rowid from
+    # the row MIN(rank) picked
+    def remove_duplicates(self):
+        return self.conn.execute(
+            'DELETE FROM history WHERE rowid NOT IN (SELECT rowid FROM (SELECT rowid, MIN(rank) FROM history GROUP BY group_name, date))').rowcount
 
-        if group_name not in history_data:
-            history_data[group_name] = []
+    # Merge duplicate same-day rows into the one with the lowest rank, in the store and in
+    # history.csv. The import already merged the CSV's duplicates in the store, so history.csv
+    # is rewritten whenever it holds more rows than the store. Returns the number of rows
+    # removed from history.csv.
+    def compact(self):
+        with self.conn:
+            self.remove_duplicates()
+        with open(self.csv_path, 'r', encoding='utf-8') as f:
+            removed = sum(1 for _ in csv.DictReader(f)) - self.row_count()
+        if removed:
+            self.export_csv(self.csv_path)
+        return removed
+
+    def export_csv(self, path):
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            writer = csv.writer(f)
+            writer.writerow(history_columns)
+            writer.writerows(self.conn.execute('SELECT date, group_name, rank FROM history ORDER BY rowid'))
+        with self.conn:
+            self.record_csv_stat()
+
+    # Most recent rank of a group and its date, ignoring entries dated exclude_date; the lowest
+    # (highest-ranking) rank wins when a date has several
+    def last_rank(self, group_name, exclude_date):
+        return self.conn.execute(
+            'SELECT rank, date FROM history WHERE group_name = ? AND date <> ? ORDER BY date DESC, rank LIMIT 1',
+            (group_name, exclude_date)).fetchone()
+
+    # A group's chart series: one {'date', 'rank'} point per date, oldest first, ignoring entries
+    # dated exclude_date
+    def series(self, group_name, exclude_date):
+        return [{'date': date, 'rank': rank} for date, rank in self.conn.execute(
+            'SELECT date, MIN(rank) FROM history WHERE group_name = ? AND date <> ? GROUP BY date ORDER BY date',
+            (group_name, exclude_date))]
+
+    # Append (date, group name, rank) rows to both the store and history.csv
+    def append(self, rows):
+        write_header = not os.path.exists(self.csv_path)
+        with self.conn:
+            with open(self.csv_path, 'a', newline='', encoding='utf-8') as f:
+                writer = csv.writer(f)
+                if write_header:
+                    writer.writerow(history_columns)
+                writer.writerows(rows)
+            self.conn.executemany('INSERT INTO history (date, group_name, rank) VALUES (?, ?, ?)', rows)
+            self.record_csv_stat()
+
+    def close(self):
+        self.conn.close()
+
+# Function to downsample a chart series of {'date', 'rank'} points to at most max_points with
+# Largest-Triangle-Three-Buckets: the first and last points are kept and each bucket in between
+# contributes the point forming the largest triangle with its neighbours, so peaks and dips
+# survive. A max_points of 0 keeps every point.
+def downsample_series(series, max_points):
+    if not max_points or len(series) <= max_points:
+        return series
+    ranks = [point['rank'] for point in series]
+    bucket_size = (len(series) - 2) / (max_points - 2)
+    sampled = [series[0]]
+    a = 0
+    for i in range(max_points - 2):
+        start = int(i * bucket_size) + 1
+        end = int((i + 1) * bucket_size) + 1
+        next_end = min(int((i + 2) * bucket_size) + 1, len(series))
+        avg_x = (end + next_end - 1) / 2
+        avg_y = sum(ranks[end:next_end]) / (next_end - end)
+        ax, ay = a, ranks[a]
+        a = max(range(start, end), key=lambda j: abs((ax - avg_x) * (ranks[j] - ay) - (ax - j) * (avg_y - ay)))
+        sampled.append(series[a])
+    sampled.append(series[-1])
+    return sampled
+
+# Precompiled HTML template. The text is parsed once into static chunks and ${name} fields and
+# compiled into a function that builds the whole output with a single f-string, so rendering
+# never re-parses the template or grows strings with +=. Row templates are rendered into a list
+# of chunks, and a list passed as a field value is joined once. Hot loops may call `compiled`
+# directly with the fields positionally, in order of first appearance (see field_names).
+class Template:
+    field_re = re.compile(r'\$\{(\w+)\}')
+
+    def __init__(self, text):
+        parts = self.field_re.split(text)
+        self.field_names = list(dict.fromkeys(parts[1::2]))
+        body = ''.join(part.replace('{', '{{').replace('}', '}}') if i % 2 == 0 else '{' + part + '}' for i, part in enumerate(parts))
+        namespace = {}
+        exec(f"def render({', '.join(self.field_names)}):\n    return f{body!r}", namespace)
+        self.compiled = namespace['render']
+
+    def render(self, **values):
+        for name, value in values.items():
+            if isinstance(value, list):
+                values[name] = ''.join(value)
+        return self.compiled(**values)
+
+    def render_into(self, out, **values):
+        out.append(self.compiled(**values))
+        return out
+
+# Group page stylesheet, published once as docs/assets/group.<hash>.css
+group_page_css = """body { font-family: Arial, sans-serif; margin: 20px; background-color: #1e2a44; color: #ffffff; text-align: center; }
+h1, h2 { color: #e6b800; width: 90%; margin: 20px auto; text-align: center; font-size: 36px; }
+.info { background-color: #2a3a5c; padding: 10px; border-radius: 5px; margin-bottom: 20px; width: 90%; margin-left: auto; margin-right: auto; }
+.hashtags { list-style-type: none; padding: 0; }
+.hashtag-item { background-color: #3b4a6b; margin: 5px 0; padding: 5px; border-radius: 3px; display: inline-block; width: 200px; color: #ffffff; }
+.rank-container {
+    width: 90%;
+    margin: 20px auto;
+    display: flex;
+    justify-content: center;
+    align-items: center;
+    gap: 20px;
+    flex-wrap: wrap;
+}
+.rank-number { font-size: 48px; font-weight: bold; color: #e6b800; display: inline-block; }
+@keyframes countUp { from { content: "0"; } to { content: attr(data-rank); } }
+.rank-number::before { content: "0"; animation: countUp 2s ease-out forwards; display: inline-block; min-width: 60px; }
+.chart-container { max-width: 400px; width: 100%; background-color: #2a3a5c; padding: 10px; border-radius: 5px; }
+canvas { width: 100% !important; height: auto !important; }
+.titles-grid {
+    display: grid;
+    grid-template-columns: repeat(3, 1fr);
+    gap: 20px;
+    margin: 20px 0;
+    width: 100%;
+    box-sizing: border-box;
+}
+.grid-item {
+    background-color: #2a3a5c;
+    padding: 10px;
+    border-radius: 5px;
+    text-align: center;
+    display: flex;
+    flex-direction: column;
+    align-items: center;
+    width: 100%;
+    box-sizing: border-box;
+}
+.grid-item video, .grid-item img {
+    width: 100%;
+    height: 300px;
+    border-radius: 5px;
+    object-fit: cover;
+}
+.grid-item .title {
+    margin: 10px 0 5px;
+    font-size: 16px;
+    font-weight: bold;
+    color: #e6b800;
+}
+.grid-item .date {
+    margin: 0;
+    font-size: 14px;
+    color: #cccccc;
+}
+.titles-table {
+    width: 100%;
+    margin: 20px 0;
+    border-collapse: collapse;
+    background-color: #2a3a5c;
+}
+.titles-table th, .titles-table td {
+    padding: 10px;
+    border: 1px solid #3b4a6b;
+    text-align: left;
+    vertical-align: middle;
+    color: #ffffff;
+}
+.titles-table th {
+    background-color: #e6b800;
+    color: #1e2a44;
+    cursor: pointer;
+}
+.titles-table th:hover {
+    background-color: #b30000;
+}
+a { color: #e6b800; text-decoration: none; }
+a:hover { color: #b30000; text-decoration: underline; }
+.container {
+    position: relative;
+    width: 90%;
+    margin: 20px auto;
+    height: auto;
+    max-height: 600px;
+    display: block;
+    overflow: hidden;
+    background-color: #2a3a5c;
+}
+.mySlides {
+    display: none;
+    width: 100%;
+    height: auto;
+    aspect-ratio: 16/9;
+}
+.mySlides img {
+    width: 100%;
+    height: auto;
+    object-fit: contain;
+}
+.cursor { cursor: pointer; }
+.prev, .next {
+    cursor: pointer;
+    position: absolute;
+    top: 50%;
+    transform: translateY(-50%);
+    width: auto;
+    padding: 16px;
+    color: #e6b800;
+    font-weight: bold;
+    font-size: 20px;
+    border-radius: 0 3px 3px 0;
+    user-select: none;
+    -webkit-user-select: none;
+    z-index: 10;
+}
+.prev { left: 0; }
+.next { right: 0; border-radius: 3px 0 0 3px; }
+.prev:hover, .next:hover { background-color: #b30000; }
+.numbertext {
+    color: #e6b800;
+    font-size: 12px;
+    padding: 8px 12px;
+    position: absolute;
+    top: 0;
+    z-index: 10;
+}
+.caption-container {
+    text-align: center;
+    background-color: #1e2a44;
+    padding: 2px 16px;
+    color: #e6b800;
+}
+.row {
+    display: flex;
+    flex-wrap: wrap;
+    justify-content: center;
+    margin-top: 10px;
+}
+.column {
+    max-width: 100px;
+    padding: 5px;
+}
+.demo {
+    opacity: 0.6;
+    width: 100%;
+    height: auto;
+    object-fit: cover;
+}
+.active, .demo:hover { opacity: 1; }
+.tab {
+    overflow: hidden;
+    margin: 20px auto;
+    width: 90%;
+    background-color: #2a3a5c;
+    border-radius: 5px 5px 0 0;
+}
+.tab button {
+    background-color: #2a3a5c;
+    color: #e6b800;
+    float: left;
+    border: none;
+    outline: none;
+    cursor: pointer;
+    padding: 14px 16px;
+    transition: 0.3s;
+    font-size: 17px;
+    width: 50%;
+}
+.tab button:hover { background-color: #b30000; }
+.tab button.active { background-color: #3b4a6b; }
+.tabcontent {
+    display: none;
+    padding: 6px 12px;
+    border-top: none;
+    background-color: #2a3a5c;
+    margin: 0 auto;
+    width: 90%;
+    border-radius: 0 0 5px 5px;
+}
+#Videos { display: block; }
+@media only screen and (max-width: 1200px) {
+    .titles-grid { grid-template-columns: repeat(3, 1fr); }
+    .grid-item video, .grid-item img { height: 200px; }
+    h1, .info, .container, .tab, .tabcontent { width: 90%; }
+    .rank-container { width: 90%; }
+}
+@media only screen and (max-width: 768px) {
+    .titles-grid { grid-template-columns: repeat(3, 1fr); }
+    .grid-item video, .grid-item img { height: 150px; }
+    .container { width: 90%; max-height: 400px; }
+    h1 { margin: 10px auto; font-size: 30px; }
+    .info, .tab, .tabcontent, .rank-container { width: 90%; }
+    .rank-container { flex-direction: column; gap: 10px; }
+    .chart-container { max-width: 100%; }
+    .column { flex: 0 0 80px; max-width: 80px; }
+    .mySlides img { object-fit: contain; }
+    .tab button { font-size: 14px; padding: 10px; }
+}
+"""
 
-        # Pre-compute JSON for history data to avoid f-string issue
-        history_data_json = json.dumps(history_data.get(group_name, []))
+# Group page script: slideshow, tabs, rank chart and titles sorting. Each page defines
+# rankHistory and rankSuggestedMax before loading it.
+group_page_js = """// Media is attached lazily: slides other than the first and grid videos carry their URL in
+// data-src until they are needed
+function loadMedia(element) {
+    if (element && element.dataset.src) {
+        element.src = element.dataset.src;
+        delete element.dataset.src;
+    }
+}
 
-        # HTML content for group pages
-        html_content = f"""<!DOCTYPE html>
+let slideIndex = 1;
+showSlides(slideIndex);
+function plusSlides(n) {
+    clearInterval(autoSlide);
+    showSlides(slideIndex += n);
+    autoSlide = setInterval(() => plusSlides(1), 3000);
+}
+function currentSlide(n) {
+    clearInterval(autoSlide);
+    showSlides(slideIndex = n);
+    autoSlide = setInterval(() => plusSlides(1), 3000);
+}
+function showSlides(n) {
+    let i;
+    let slides = document.getElementsByClassName("mySlides");
+    let dots = document.getElementsByClassName("demo");
+    let captionText = document.getElementById("caption");
+    if (n > slides.length) { slideIndex = 1 }
+    if (n < 1) { slideIndex = slides.length }
+    for (i = 0; i < slides.length; i++) {
+        slides[i].style.display = "none";
+    }
+    for (i = 0; i < dots.length; i++) {
+        dots[i].className = dots[i].className.replace(" active", "");
+    }
+    // Load the active slide now and the next one ahead of the slideshow advancing
+    loadMedia(slides[slideIndex-1].querySelector('img'));
+    loadMedia(slides[slideIndex % slides.length].querySelector('img'));
+    slides[slideIndex-1].style.display = "block";
+    dots[slideIndex-1].className += " active";
+    captionText.innerHTML = dots[slideIndex-1].alt;
+}
+let autoSlide = setInterval(() => plusSlides(1), 3000);
+
+function openTab(evt, tabName) {
+    let i, tabcontent, tablinks;
+    tabcontent = document.getElementsByClassName("tabcontent");
+    for (i = 0; i < tabcontent.length; i++) {
+        tabcontent[i].style.display = "none";
+    }
+    tablinks = document.getElementsByClassName("tablinks");
+    for (i = 0; i < tablinks.length; i++) {
+        tablinks[i].className = tablinks[i].className.replace(" active", "");
+    }
+    document.getElementById(tabName).style.display = "block";
+    evt.currentTarget.className += " active";
+}
+
+// Chart.js for rank history
+document.addEventListener('DOMContentLoaded', function() {
+    const ctx = document.getElementById('rankChart').getContext('2d');
+    const historyData = rankHistory;
+    const dates = historyData.map(entry => entry.date);
+    const ranks = historyData.map(entry => entry.rank);
+    new Chart(ctx, {
+        type: 'line',
+        data: {
+            labels: dates,
+            datasets: [{
+                label: 'Rank Over Time',
+                data: ranks,
+                borderColor: '#e6b800',
+                backgroundColor: 'rgba(230, 184, 0, 0.2)',
+                fill: true,
+                tension: 0.4
+            }]
+        },
+        options: {
+            scales: {
+                y: {
+                    beginAtZero: true,
+                    title: { display: true, text: 'Rank', color: '#e6b800' },
+                    ticks: { stepSize: 1, color: '#ffffff' },
+                    suggestedMax: rankSuggestedMax,
+                    grid: { color: '#3b4a6b' }
+                },
+                x: {
+                    title: { display: true, text: 'Date', color: '#e6b800' },
+                    ticks: { color: '#ffffff' },
+                    grid: { color: '#3b4a6b' }
+                }
+            },
+            plugins: {
+                legend: { display: true, labels: { color: '#e6b800' } }
+            }
+        }
+    });
+
+    // Attach grid video sources once they come near the viewport
+    const videos = document.querySelectorAll('.grid-item video');
+    if ('IntersectionObserver' in window) {
+        const videoObserver = new IntersectionObserver(entries => {
+            entries.forEach(entry => {
+                if (entry.isIntersecting) {
+                    loadMedia(entry.target);
+                    videoObserver.unobserve(entry.target);
+                }
+            });
+        }, { rootMargin: '200px' });
+        videos.forEach(video => videoObserver.observe(video));
+    } else {
+        videos.forEach(loadMedia);
+    }
+
+    // Add hover-to-play for videos in titles grid
+    videos.forEach(video => {
+        video.addEventListener('mouseover', () => {
+            loadMedia(video);
+            video.play().catch(error => {
+                console.error('Error playing video:', error);
+            });
+        });
+        video.addEventListener('mouseout', () => {
+            video.pause();
+        });
+    });
+
+    // Initialize titles table sorted by S.No descending (highest ID at top)
+    sortTitlesTable(0, -1); // Sort by S.No column, highest first
+});
+
+// Titles table and grid sorting
+let titlesSortDirections = [-1, 0, 0]; // S.No starts descending
+function sortTitlesTable(columnIndex, forceDirection) {
+    const tbody = document.getElementById('titlesTableBody');
+    const rows = Array.from(tbody.getElementsByTagName('tr'));
+    const direction = forceDirection !== undefined ? forceDirection : (titlesSortDirections[columnIndex] === 1 ? -1 : 1);
+    rows.sort((a, b) => {
+        let aValue = a.cells[columnIndex].innerText;
+        let bValue = b.cells[columnIndex].innerText;
+        if (columnIndex === 0) { // S.No column
+            aValue = parseInt(aValue);
+            bValue = parseInt(bValue);
+            return direction * (aValue - bValue);
+        } else if (columnIndex === 2) { // Date column
+            aValue = new Date(aValue);
+            bValue = new Date(bValue);
+            return direction * (aValue - bValue);
+        } else if (columnIndex === 1) { // Items column
+            return direction * aValue.localeCompare(bValue);
+        }
+        return 0;
+    });
+    while (tbody.firstChild) {
+        tbody.removeChild(tbody.firstChild);
+    }
+    rows.forEach(row => tbody.appendChild(row));
+    titlesSortDirections[columnIndex] = direction;
+    titlesSortDirections = titlesSortDirections.map((d, i) => i === columnIndex ? d : 0);
+    // Sync grid with table
+    sortTitlesGrid(columnIndex, direction);
+}
+
+function sortTitlesGrid(columnIndex, direction) {
+    const grid = document.getElementById('titlesGrid');
+    const items = Array.from(grid.getElementsByClassName('grid-item'));
+    items.sort((a, b) => {
+        let aValue, bValue;
+        if (columnIndex === 0) { // S.No
+            aValue = parseInt(a.querySelector('.date').innerText.split('S.No: ')[1].split(' | ')[0]);
+            bValue = parseInt(b.querySelector('.date').innerText.split('S.No: ')[1].split(' | ')[0]);
+            return direction * (aValue - bValue);
+        } else if (columnIndex === 1) { // Items
+            aValue = a.querySelector('.title').innerText;
+            bValue = b.querySelector('.title').innerText;
+            return direction * aValue.localeCompare(bValue);
+        } else if (columnIndex === 2) { // Date
+            aValue = new Date(a.querySelector('.date').innerText.split(' | ')[1]);
+            bValue = new Date(b.querySelector('.date').innerText.split(' | ')[1]);
+            return direction * (aValue - bValue);
+        }
+        return 0;
+    });
+    while (grid.firstChild) {
+        grid.removeChild(grid.firstChild);
+    }
+    items.forEach(item => grid.appendChild(item));
+}
+"""
+
+# Index page stylesheet, published once as docs/assets/index.<hash>.css
+index_page_css = """body { font-family: Arial, sans-serif; background-color: #1e2a44; color: #ffffff; margin: 20px; text-align: center; }
+h1, h2 { color: #e6b800; }
+table { width: 80%; margin: 20px auto; border-collapse: collapse; background-color: #2a3a5c; box-shadow: 0 0 10px rgba(0, 0, 0, 0.3); }
+th, td { border: 1px solid #3b4a6b; text-align: center; vertical-align: middle; padding: 15px; color: #ffffff; }
+th { background-color: #e6b800; color: #1e2a44; cursor: pointer; }
+th:hover { background-color: #b30000; }
+tr:hover { background-color: #3b4a6b; }
+.up-down-img { width: 20px; height: 20px; vertical-align: middle; }
+a { text-decoration: none; color: #e6b800; }
+a:hover { color: #b30000; text-decoration: underline; }
+.flip-card { background-color: transparent; width: 300px; height: 300px; perspective: 1000px; margin: 10px auto; }
+.flip-card-inner { position: relative; width: 100%; height: 100%; text-align: center; transition: transform 0.6s; transform-style: preserve-3d; box-shadow: 0 4px 8px 0 rgba(0,0,0,0.2); }
+.flip-card:hover .flip-card-inner { transform: rotateY(180deg); }
+.flip-card-front, .flip-card-back { position: absolute; width: 100%; height: 100%; backface-visibility: hidden; border-radius: 5px; }
+.flip-card-front { background-color: #2a3a5c; color: #ffffff; }
+.flip-card-back { background-color: #3b4a6b; color: #e6b800; transform: rotateY(180deg); display: flex; justify-content: center; align-items: center; flex-direction: column; }
+.flip-card-back h1 { margin: 0; font-size: 24px; word-wrap: break-word; padding: 10px; }
+.mover-info { display: flex; flex-direction: column; align-items: center; gap: 10px; width: 320px; }
+.mover-info p { margin: 5px 0; font-size: 16px; }
+#topMoversTable td { min-width: 340px; }
+.pager { display: flex; justify-content: center; align-items: center; gap: 15px; margin: 10px auto 30px; }
+.pager button { background-color: #e6b800; color: #1e2a44; border: none; border-radius: 5px; padding: 8px 16px; font-size: 16px; cursor: pointer; }
+.pager button:disabled { background-color: #3b4a6b; color: #ffffff; cursor: default; }
+@media only screen and (max-width: 1200px) {
+    table { width: 90%; }
+    .flip-card { width: 200px; height: 200px; }
+    .flip-card-back h1 { font-size: 18px; }
+    th, td { font-size: 14px; padding: 10px; }
+    .mover-info { width: 220px; }
+    .mover-info p { font-size: 14px; }
+    #topMoversTable td { min-width: 240px; }
+}
+@media only screen and (max-width: 768px) {
+    table { width: 95%; }
+    .flip-card { width: 150px; height: 150px; }
+    .flip-card-back h1 { font-size: 16px; }
+    th, td { font-size: 12px; padding: 8px; }
+    .mover-info { width: 170px; }
+    .mover-info p { font-size: 12px; }
+    #topMoversTable td { min-width: 190px; }
+    #topMoversTable { display: block; overflow-x: auto; white-space: nowrap; }
+}
+"""
+
+# Index page script: ranking table sorting
+index_page_js = """// Ranking rows come from the JSON dataset embedded in the page. Sort keys are computed once per
+// row, and only the rows of the current page are put in the DOM.
+const rankingRows = JSON.parse(document.getElementById('rankingData').textContent);
+const pageSize = 50;
+let currentPage = 0;
+let sortDirections = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0];
+
+// Row field sorted by each column; missing values (N/A) sort last in ascending order
+const sortFields = ['rank', 'lastRank', 'upDown', 'name', null, 'lastScene', 'titles', 'five', 'four', 'three', 'sceneTypes', 'scoreValue'];
+rankingRows.forEach(row => {
+    row.keys = sortFields.map(field => field === null || row[field] === null ? Infinity : row[field]);
+});
+// Group names sort by their position in locale order
+const collator = new Intl.Collator();
+const byName = rankingRows.slice().sort((a, b) => collator.compare(a.name, b.name));
+byName.forEach((row, i) => {
+    row.keys[3] = i > 0 && collator.compare(byName[i - 1].name, row.name) === 0 ? byName[i - 1].keys[3] : i;
+});
+
+function escapeHtml(value) {
+    return String(value).replace(/[&<>"']/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#x27;'})[c]);
+}
+
+function upDownHtml(upDown) {
+    if (upDown === null) return 'N/A';
+    if (upDown > 0) return upDown + " <img src='Photos/up.png' alt='Up' class='up-down-img'>";
+    if (upDown < 0) return upDown + " <img src='Photos/down.png' alt='Down' class='up-down-img'>";
+    return upDown + " <img src='Photos/0.png' alt='No Change' class='up-down-img'>";
+}
+
+function rowHtml(row) {
+    const name = escapeHtml(row.name);
+    const page = escapeHtml(row.page);
+    return '<tr>' +
+        '<td>' + row.rank + '</td>' +
+        '<td>' + (row.lastRank === null ? 'N/A' : row.lastRank + ' (' + escapeHtml(row.lastRankDate) + ')') + '</td>' +
+        '<td>' + upDownHtml(row.upDown) + '</td>' +
+        '<td><a href="' + page + '" target="_blank">' + name + '</a></td>' +
+        '<td><div class="flip-card"><div class="flip-card-inner"><div class="flip-card-front"><img src="' + escapeHtml(row.photo) + '"' +
+        (row.photoSrcset ? ' srcset="' + escapeHtml(row.photoSrcset) + '"' : '') + ' alt="' + name + '" loading="lazy" decoding="async" style="width:300px;height:300px;object-fit:cover;"></div>' +
+        '<div class="flip-card-back"><a href="' + page + '" target="_blank" style="color: #e6b800; text-decoration: none;"><h1>' + name + '</h1></a></div></div></div></td>' +
+        '<td>' + (row.lastScene === null ? 'N/A' : row.lastScene + ' days') + '</td>' +
+        '<td>' + row.titles + '</td>' +
+        '<td>' + row.five + '</td>' +
+        '<td>' + row.four + '</td>' +
+        '<td>' + row.three + '</td>' +
+        '<td>' + row.sceneTypes + '</td>' +
+        '<td>' + row.score + '</td>' +
+        '</tr>';
+}
+
+function renderPage() {
+    const pageCount = Math.max(1, Math.ceil(rankingRows.length / pageSize));
+    currentPage = Math.min(Math.max(currentPage, 0), pageCount - 1);
+    const start = currentPage * pageSize;
+    document.getElementById('tableBody').innerHTML = rankingRows.slice(start, start + pageSize).map(rowHtml).join('');
+    document.getElementById('pageInfo').textContent = 'Page ' + (currentPage + 1) + ' of ' + pageCount;
+    document.getElementById('prevPage').disabled = currentPage === 0;
+    document.getElementById('nextPage').disabled = currentPage === pageCount - 1;
+}
+
+function changePage(step) {
+    currentPage += step;
+    renderPage();
+    document.getElementById('rankingTable').scrollIntoView();
+}
+
+function sortTable(columnIndex) {
+    if (columnIndex === 4) return; // Skip Photo column
+    const direction = sortDirections[columnIndex] === 1 ? -1 : 1;
+    rankingRows.sort((a, b) => {
+        const aKey = a.keys[columnIndex];
+        const bKey = b.keys[columnIndex];
+        return aKey === bKey ? 0 : (aKey < bKey ? -direction : direction);
+    });
+    sortDirections = sortDirections.map((d, i) => i === columnIndex ? direction : 0);
+    currentPage = 0;
+    renderPage();
+}
+
+renderPage();
+"""
+
+# Group page
+group_page_template = Template("""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>{group_name}</title>
+    <title>${group_name}</title>
     <script src="https://cdn.jsdelivr.net/npm/chart.js@4.4.2/dist/chart.umd.min.js"></script>
-    <style>
-        body {{ font-family: Arial, sans-serif; margin: 20px; background-color: #1e2a44; color: #ffffff; text-align: center; }}
-        h1, h2 {{ color: #e6b800; width: 90%; margin: 20px auto; text-align: center; font-size: 36px; }}
-        .info {{ background-color: #2a3a5c; padding: 10px; border-radius: 5px; margin-bottom: 20px; width: 90%; margin-left: auto; margin-right: auto; }}
-        .hashtags {{ list-style-type: none; padding: 0; }}
-        .hashtag-item {{ background-color: #3b4a6b; margin: 5px 0; padding: 5px; border-radius: 3px; display: inline-block; width: 200px; color: #ffffff; }}
-        .rank-container {{ 
-            width: 90%; 
-            margin: 20px auto; 
-            display: flex; 
-            justify-content: center; 
-            align-items: center; 
-            gap: 20px; 
-            flex-wrap: wrap; 
-        }}
-        .rank-number {{ font-size: 48px; font-weight: bold; color: #e6b800; display: inline-block; }}
-        @keyframes countUp {{ from {{ content: "0"; }} to {{ content: attr(data-rank); }} }}
-        .rank-number::before {{ content: "0"; animation: countUp 2s ease-out forwards; display: inline-block; min-width: 60px; }}
-        .chart-container {{ max-width: 400px; width: 100%; background-color: #2a3a5c; padding: 10px; border-radius: 5px; }}
-        canvas {{ width: 100% !important; height: auto !important; }}
-        .titles-grid {{ 
-            display: grid; 
-            grid-template-columns: repeat(3, 1fr); 
-            gap: 20px; 
-            margin: 20px 0; 
-            width: 100%; 
-            box-sizing: border-box; 
-        }}
-        .grid-item {{ 
-            background-color: #2a3a5c; 
-            padding: 10px; 
-            border-radius: 5px; 
-            text-align: center; 
-            display: flex; 
-            flex-direction: column; 
-            align-items: center; 
-            width: 100%; 
-            box-sizing: border-box; 
-        }}
-        .grid-item video, .grid-item img {{ 
-            width: 100%; 
-            height: 300px; 
-            border-radius: 5px; 
-            object-fit: cover; 
-        }}
-        .grid-item .title {{ 
-            margin: 10px 0 5px; 
-            font-size: 16px; 
-            font-weight: bold; 
-            color: #e6b800; 
-        }}
-        .grid-item .date {{ 
-            margin: 0; 
-            font-size: 14px; 
-            color: #cccccc; 
-        }}
-        .titles-table {{ 
-            width: 100%; 
-            margin: 20px 0; 
-            border-collapse: collapse; 
-            background-color: #2a3a5c; 
-        }}
-        .titles-table th, .titles-table td {{ 
-            padding: 10px; 
-            border: 1px solid #3b4a6b; 
-            text-align: left; 
-            vertical-align: middle; 
-            color: #ffffff; 
-        }}
-        .titles-table th {{ 
-            background-color: #e6b800; 
-            color: #1e2a44; 
-            cursor: pointer; 
-        }}
-        .titles-table th:hover {{ 
-            background-color: #b30000; 
-        }}
-        a {{ color: #e6b800; text-decoration: none; }}
-        a:hover {{ color: #b30000; text-decoration: underline; }}
-        .container {{ 
-            position: relative; 
-            width: 90%; 
-            margin: 20px auto; 
-            height: auto; 
-            max-height: 600px; 
-            display: block; 
-            overflow: hidden; 
-            background-color: #2a3a5c; 
-        }}
-        .mySlides {{ 
-            display: none; 
-            width: 100%; 
-            height: auto; 
-            aspect-ratio: 16/9; 
-        }}
-        .mySlides img {{ 
-            width: 100%; 
-            height: auto; 
-            object-fit: contain; 
-        }}
-        .cursor {{ cursor: pointer; }}
-        .prev, .next {{ 
-            cursor: pointer; 
-            position: absolute; 
-            top: 50%; 
-            transform: translateY(-50%); 
-            width: auto; 
-            padding: 16px; 
-            color: #e6b800; 
-            font-weight: bold; 
-            font-size: 20px; 
-            border-radius: 0 3px 3px 0; 
-            user-select: none; 
-            -webkit-user-select: none; 
-            z-index: 10; 
-        }}
-        .prev {{ left: 0; }}
-        .next {{ right: 0; border-radius: 3px 0 0 3px; }}
-        .prev:hover, .next:hover {{ background-color: #b30000; }}
-        .numbertext {{ 
-            color: #e6b800; 
-            font-size: 12px; 
-            padding: 8px 12px; 
-            position: absolute; 
-            top: 0; 
-            z-index: 10; 
-        }}
-        .caption-container {{ 
-            text-align: center; 
-            background-color: #1e2a44; 
-            padding: 2px 16px; 
-            color: #e6b800; 
-        }}
-        .row {{ 
-            display: flex; 
-            flex-wrap: wrap; 
-            justify-content: center; 
-            margin-top: 10px; 
-        }}
-        .column {{ 
-            flex: 0 0 {100 / len(photo_paths) if photo_paths else 100}%; 
-            max-width: 100px; 
-            padding: 5px; 
-        }}
-        .demo {{ 
-            opacity: 0.6; 
-            width: 100%; 
-            height: auto; 
-            object-fit: cover; 
-        }}
-        .active, .demo:hover {{ opacity: 1; }}
-        .tab {{ 
-            overflow: hidden; 
-            margin: 20px auto; 
-            width: 90%; 
-            background-color: #2a3a5c; 
-            border-radius: 5px 5px 0 0; 
-        }}
-        .tab button {{ 
-            background-color: #2a3a5c; 
-            color: #e6b800; 
-            float: left; 
-            border: none; 
-            outline: none; 
-            cursor: pointer; 
-            padding: 14px 16px; 
-            transition: 0.3s; 
-            font-size: 17px; 
-            width: 50%; 
-        }}
-        .tab button:hover {{ background-color: #b30000; }}
-        .tab button.active {{ background-color: #3b4a6b; }}
-        .tabcontent {{ 
-            display: none; 
-            padding: 6px 12px; 
-            border-top: none; 
-            background-color: #2a3a5c; 
-            margin: 0 auto; 
-            width: 90%; 
-            border-radius: 0 0 5px 5px; 
-        }}
-        #Videos {{ display: block; }}
-        @media only screen and (max-width: 1200px) {{ 
-            .titles-grid {{ grid-template-columns: repeat(3, 1fr); }} 
-            .grid-item video, .grid-item img {{ height: 200px; }}
-            h1, .info, .container, .tab, .tabcontent {{ width: 90%; }}
-            .rank-container {{ width: 90%; }}
-        }}
-        @media only screen and (max-width: 768px) {{ 
-            .titles-grid {{ grid-template-columns: repeat(3, 1fr); }} 
-            .grid-item video, .grid-item img {{ height: 150px; }}
-            .container {{ width: 90%; max-height: 400px; }} 
-            h1 {{ margin: 10px auto; font-size: 30px; }}
-            .info, .tab, .tabcontent, .rank-container {{ width: 90%; }}
-            .rank-container {{ flex-direction: column; gap: 10px; }} 
-            .chart-container {{ max-width: 100%; }} 
-            .column {{ flex: 0 0 80px; max-width: 80px; }} 
-            .mySlides img {{ object-fit: contain; }} 
-            .tab button {{ font-size: 14px; padding: 10px; }}
-        }}
-    </style>
+    <style>.column { flex: 0 0 ${column_width}%; }</style>
+    <link rel="stylesheet" href="../${group_css}">
 </head>
 <body>
-    <h1>{group_name}</h1>
+    <h1>${group_name}</h1>
     <div class="rank-container">
         <div class="chart-container"><h2>Rank History</h2><canvas id="rankChart"></canvas></div>
-        <p>Rank: <span class="rank-number" data-rank="RANK_PLACEHOLDER"></span></p>
+        <p>Rank: <span class="rank-number" data-rank="${rank}"></span></p>
     </div>
-    {slideshow_content}
-    <div class="info"><p>Scenes: {total_messages}</p><p>Last Scene: {date_diff_text}</p></div>
+    ${slideshow_content}
+    <div class="info"><p>Scenes: ${total_messages}</p><p>Last Scene: ${date_diff_text}</p></div>
     <div class="info">
-        <h2>Rating Hashtag Counts (#FIVE, #FOUR, #Three)</h2><ul class="hashtags">{ratings_hashtag_list}</ul>
-        <h2>Scene Type Hashtag Counts</h2><ul class="hashtags">{scene_types_hashtag_list}</ul>
-        <h2>Other Hashtag Counts</h2><ul class="hashtags">{other_hashtag_list}</ul>
+        <h2>Rating Hashtag Counts (#FIVE, #FOUR, #Three)</h2><ul class="hashtags">${ratings_hashtag_list}</ul>
+        <h2>Scene Type Hashtag Counts</h2><ul class="hashtags">${scene_types_hashtag_list}</ul>
+        <h2>Other Hashtag Counts</h2><ul class="hashtags">${other_hashtag_list}</ul>
     </div>
     <div class="info">
         <h2>Titles</h2>
@@ -537,402 +1279,61 @@ for chat in chats:
             <button class="tablinks" onclick="openTab(event, 'Table')">Table</button>
         </div>
         <div id="Videos" class="tabcontent">
-            {titles_grid}
+            ${titles_grid}
         </div>
         <div id="Table" class="tabcontent">
-            {titles_table}
+            ${titles_table}
         </div>
     </div>
     <script>
-        let slideIndex = 1;
-        showSlides(slideIndex);
-        function plusSlides(n) {{ 
-            clearInterval(autoSlide); 
-            showSlides(slideIndex += n); 
-            autoSlide = setInterval(() => plusSlides(1), 3000); 
-        }}
-        function currentSlide(n) {{ 
-            clearInterval(autoSlide); 
-            showSlides(slideIndex = n); 
-            autoSlide = setInterval(() => plusSlides(1), 3000); 
-        }}
-        function showSlides(n) {{
-            let i;
-            let slides = document.getElementsByClassName("mySlides");
-            let dots = document.getElementsByClassName("demo");
-            let captionText = document.getElementById("caption");
-            if (n > slides.length) {{ slideIndex = 1 }}
-            if (n < 1) {{ slideIndex = slides.length }}
-            for (i = 0; i < slides.length; i++) {{ 
-                slides[i].style.display = "none"; 
-            }}
-            for (i = 0; i < dots.length; i++) {{ 
-                dots[i].className = dots[i].className.replace(" active", ""); 
-            }}
-            slides[slideIndex-1].style.display = "block";
-            dots[slideIndex-1].className += " active";
-            captionText.innerHTML = dots[slideIndex-1].alt;
-        }}
-        let autoSlide = setInterval(() => plusSlides(1), 3000);
-
-        function openTab(evt, tabName) {{
-            let i, tabcontent, tablinks;
-            tabcontent = document.getElementsByClassName("tabcontent");
-            for (i = 0; i < tabcontent.length; i++) {{
-                tabcontent[i].style.display = "none";
-            }}
-            tablinks = document.getElementsByClassName("tablinks");
-            for (i = 0; i < tablinks.length; i++) {{
-                tablinks[i].className = tablinks[i].className.replace(" active", "");
-            }}
-            document.getElementById(tabName).style.display = "block";
-            evt.currentTarget.className += " active";
-        }}
-
-        // Chart.js for rank history
-        document.addEventListener('DOMContentLoaded', function() {{
-            const ctx = document.getElementById('rankChart').getContext('2d');
-            const historyData = {history_data_json};
-            const dates = historyData.map(entry => entry.date);
-            const ranks = historyData.map(entry => entry.rank);
-            new Chart(ctx, {{
-                type: 'line',
-                data: {{ 
-                    labels: dates, 
-                    datasets: [{{
-                        label: 'Rank Over Time', 
-                        data: ranks, 
-                        borderColor: '#e6b800', 
-                        backgroundColor: 'rgba(230, 184, 0, 0.2)', 
-                        fill: true, 
-                        tension: 0.4 
-                    }}] 
-                }},
-                options: {{ 
-                    scales: {{ 
-                        y: {{ 
-                            beginAtZero: true, 
-                            title: {{ display: true, text: 'Rank', color: '#e6b800' }}, 
-                            ticks: {{ stepSize: 1, color: '#ffffff' }}, 
-                            suggestedMax: {len(chats) + 1},
-                            grid: {{ color: '#3b4a6b' }}
-                        }}, 
-                        x: {{ 
-                            title: {{ display: true, text: 'Date', color: '#e6b800' }}, 
-                            ticks: {{ color: '#ffffff' }}, 
-                            grid: {{ color: '#3b4a6b' }}
-                        }} 
-                    }}, 
-                    plugins: {{ 
-                        legend: {{ display: true, labels: {{ color: '#e6b800' }} }} 
-                    }} 
-                }}
-            }});
-
-            // Add hover-to-play for videos in titles grid
-            const videos = document.querySelectorAll('.grid-item video');
-            videos.forEach(video => {{
-                video.addEventListener('mouseover', () => {{
-                    video.play().catch(error => {{
-                        console.error('Error playing video:', error);
-                    }});
-                }});
-                video.addEventListener('mouseout', () => {{
-                    video.pause();
-                }});
-            }});
-
-            // Initialize titles table sorted by S.No descending (highest ID at top)
-            sortTitlesTable(0, -1); // Sort by S.No column, highest first
-        }});
-
-        // Titles table and grid sorting
-        let titlesSortDirections = [-1, 0, 0]; // S.No starts descending
-        function sortTitlesTable(columnIndex, forceDirection) {{
-            const tbody = document.getElementById('titlesTableBody');
-            const rows = Array.from(tbody.getElementsByTagName('tr'));
-            const direction = forceDirection !== undefined ? forceDirection : (titlesSortDirections[columnIndex] === 1 ? -1 : 1);
-            rows.sort((a, b) => {{
-                let aValue = a.cells[columnIndex].innerText;
-                let bValue = b.cells[columnIndex].innerText;
-                if (columnIndex === 0) {{ // S.No column
-                    aValue = parseInt(aValue);
-                    bValue = parseInt(bValue);
-                    return direction * (aValue - bValue);
-                }} else if (columnIndex === 2) {{ // Date column
-                    aValue = new Date(aValue);
-                    bValue = new Date(bValue);
-                    return direction * (aValue - bValue);
-                }} else if (columnIndex === 1) {{ // Items column
-                    return direction * aValue.localeCompare(bValue);
-                }}
-                return 0;
-            }});
-            while (tbody.firstChild) {{ 
-                tbody.removeChild(tbody.firstChild); 
-            }}
-            rows.forEach(row => tbody.appendChild(row));
-            titlesSortDirections[columnIndex] = direction;
-            titlesSortDirections = titlesSortDirections.map((d, i) => i === columnIndex ? d : 0);
-            // Sync grid with table
-            sortTitlesGrid(columnIndex, direction);
-        }}
-
-        function sortTitlesGrid(columnIndex, direction) {{
-            const grid = document.getElementById('titlesGrid');
-            const items = Array.from(grid.getElementsByClassName('grid-item'));
-            items.sort((a, b) => {{
-                let aValue, bValue;
-                if (columnIndex === 0) {{ // S.No
-                    aValue = parseInt(a.querySelector('.date').innerText.split('S.No: ')[1].split(' | ')[0]);
-                    bValue = parseInt(b.querySelector('.date').innerText.split('S.No: ')[1].split(' | ')[0]);
-                    return direction * (aValue - bValue);
-                }} else if (columnIndex === 1) {{ // Items
-                    aValue = a.querySelector('.title').innerText;
-                    bValue = b.querySelector('.title').innerText;
-                    return direction * aValue.localeCompare(bValue);
-                }} else if (columnIndex === 2) {{ // Date
-                    aValue = new Date(a.querySelector('.date').innerText.split(' | ')[1]);
-                    bValue = new Date(b.querySelector('.date').innerText.split(' | ')[1]);
-                    return direction * (aValue - bValue);
-                }}
-                return 0;
-            }});
-            while (grid.firstChild) {{ 
-                grid.removeChild(grid.firstChild); 
-            }}
-            items.forEach(item => grid.appendChild(item));
-        }}
+        const rankHistory = ${history_data_json};
+        const rankSuggestedMax = ${suggested_max};
     </script>
+    <script src="../${group_js}"></script>
 </body>
 </html>
-"""
+""")
 
-        # Find last rank and its date from history_data
-        last_rank = 'N/A'
-        last_rank_date = 'N/A'
-        if group_name in history_data and history_data[group_name]:
-            sorted_history = sorted(history_data[group_name], key=lambda x: x['date'], reverse=True)
-            last_rank = sorted_history[0]['rank']
-            last_rank_date = sorted_history[0]['date']
-
-        sanitized_name = sanitize_filename(group_name)
-        html_file = f"{sanitized_name}_{group_id}.html"
-        html_filename = os.path.join(html_subfolder, html_file)
-
-        all_data.append({
-            'date': current_date,
-            'group name': group_name,
-            'total messages': total_messages,
-            'Datedifference': date_diff if date_diff is not None else 'N/A',
-            'count of the hashtag "#FIVE"': hashtag_counts.get('#FIVE', 0),
-            'count of the hashtag "#FOUR"': hashtag_counts.get('#FOUR', 0),
-            'count of the hashtag "#Three"': hashtag_counts.get('#THREE', 0),
-            'count of the hashtag "#SceneType"': scene_type_count,
-            'score': 0,
-            'rank': 0,
-            'last rank': last_rank,
-            'last rank date': last_rank_date,
-            'up down': 'N/A',  # Will be calculated after ranking
-            'total titles': titles_count,
-            'html_file': html_file,
-            'html_content': html_content,
-            'photo_file_name': f"Photos/{photo_file_name}" if photo_file_name else None
-        })
+# One title in the Videos tab of a group page
+title_grid_item_template = Template("""
+                <div class='grid-item'>
+                    ${media_element}
+                    <p class='title'><a href='https://t.me/c/${telegram_group_id}/${message_id}' target='_blank'>${title}</a></p>
+                    <p class='date'>S.No: ${serial_number} | ${date}</p>
+                </div>
+            """)
 
-# Calculate scores
-min_date_diff = min(date_diffs) if date_diffs else 0
-max_date_diff_denom = max(date_diffs) - min_date_diff if date_diffs and max(date_diffs) > min_date_diff else 1
-
-for entry in all_data:
-    five_count = entry['count of the hashtag "#FIVE"']
-    four_count = entry['count of the hashtag "#FOUR"']
-    three_count = entry['count of the hashtag "#Three"']
-    messages = entry['total messages']
-    diff = entry['Datedifference']
-
-    hashtag_score = (10 * five_count) + (5 * four_count) + (1 * three_count)
-    messages_score = (messages / max_messages) * 10 if max_messages > 0 else 0
-    date_score = 0
-    if diff != 'N/A' and date_diffs:
-        date_score = 10 * (1 - (diff - min_date_diff) / max_date_diff_denom) if max_date_diff_denom > 0 else 10
-    entry['score'] = hashtag_score + messages_score + date_score
-
-# Sort by score and assign ranks
-sorted_data = sorted(all_data, key=lambda x: x['score'], reverse=True)
-for i, entry in enumerate(sorted_data, 1):
-    entry['rank'] = i
-    # Calculate up down (last_rank - rank)
-    if entry['last rank'] != 'N/A':
-        entry['up down'] = int(entry['last rank']) - i
-    history_data[entry['group name']].append({'date': current_date, 'rank': i})
-    html_content_with_rank = entry['html_content'].replace('RANK_PLACEHOLDER', str(i))
-    html_path = os.path.join(html_subfolder, entry['html_file'])
-    with open(html_path, 'w', encoding='utf-8') as f:
-        f.write(html_content_with_rank)
-    print(f"Wrote HTML file: {html_path}")
-
-# Write current run to output.csv
-csv_data = [{k: v for k, v in entry.items() if k in csv_columns} for entry in sorted_data]
-with open(csv_file, 'w', newline='', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=csv_columns)
-    writer.writeheader()
-    writer.writerows(csv_data)
-print(f"\nWrote CSV file: {csv_file}")
-
-# Append new history entries to history.csv
-new_history_rows = [{'date': current_date, 'group name': entry['group name'], 'rank': entry['rank']} for entry in sorted_data]
-new_history_rows = [row for row in new_history_rows if row.get('group name') and row.get('rank') is not None]
-if new_history_rows:
-    write_header = not os.path.exists(history_csv_file)
-    with open(history_csv_file, 'a', newline='', encoding='utf-8') as f:
-        writer = csv.DictWriter(f, fieldnames=history_columns)
-        if write_header:
-            writer.writeheader()
-        writer.writerows(new_history_rows)
-    print(f"\nAppended {len(new_history_rows)} rows to {history_csv_file}")
-else:
-    print(f"No new history entries to append to {history_csv_file}")
-
-# Generate top 5 up, down, and unchanged table
-up_groups = [entry for entry in sorted_data if entry['up down'] != 'N/A' and entry['up down'] > 0]
-down_groups = [entry for entry in sorted_data if entry['up down'] != 'N/A' and entry['up down'] < 0]
-unchanged_groups = [entry for entry in sorted_data if entry['up down'] == 0]
-
-# Sort by up_down (primary) and rank (secondary, ascending for higher rank)
-up_groups = sorted(up_groups, key=lambda x: (x['up down'], -x['rank']), reverse=True)[:5]
-down_groups = sorted(down_groups, key=lambda x: (x['up down'], -x['rank']), reverse=True)[:5]
-unchanged_groups = sorted(unchanged_groups, key=lambda x: x['rank'])[:5]  # Sort by rank ascending
-
-top_movers_rows = ''
-if up_groups or down_groups or unchanged_groups:
-    for group_list, title in [(up_groups, 'Top 5 Up'), (down_groups, 'Top 5 Down'), (unchanged_groups, 'Top 5 Unchanged')]:
-        if group_list:
-            top_movers_rows += f'<tr><th style="background-color: #b30000;">{title}</th></tr><tr>'
-            for entry in group_list:
-                group_name = escape(entry['group name'])
-                photo_src = entry['photo_file_name'] if entry['photo_file_name'] else 'https://via.placeholder.com/300'
-                html_link = f"HTML/{entry['html_file']}"
-                last_rank = entry['last rank']
-                last_rank_date = entry['last rank date']
-                last_rank_display = f"{last_rank} ({last_rank_date})" if last_rank != 'N/A' else 'N/A'
-                up_down = entry['up down']
-                if up_down > 0:
-                    up_down_content = f"{up_down} <img src='Photos/up.png' alt='Up' class='up-down-img'>"
-                elif up_down < 0:
-                    up_down_content = f"{up_down} <img src='Photos/down.png' alt='Down' class='up-down-img'>"
-                else:
-                    up_down_content = f"{up_down} <img src='Photos/0.png' alt='No Change' class='up-down-img'>"
-                top_movers_rows += f"""
+# One group in the Top Movers table of the index page
+mover_cell_template = Template("""
                     <td>
                         <div class="mover-info">
-                            <p><strong>Name:</strong> <a href="{html_link}" target="_blank">{group_name}</a></p>
-                            <div class="flip-card"><div class="flip-card-inner"><div class="flip-card-front"><img src="{photo_src}" alt="{group_name}" style="width:300px;height:300px;object-fit:cover;"></div><div class="flip-card-back"><a href="{html_link}" target="_blank" style="color: #e6b800; text-decoration: none;"><h1>{group_name}</h1></a></div></div></div>
-                            <p><strong>Rank:</strong> {entry['rank']}</p>
-                            <p><strong>Last Rank:</strong> {last_rank_display}</p>
-                            <p><strong>Up Down:</strong> {up_down_content}</p>
+                            <p><strong>Name:</strong> <a href="${html_link}" target="_blank">${group_name}</a></p>
+                            <div class="flip-card"><div class="flip-card-inner"><div class="flip-card-front"><img src="${photo_src}"${photo_srcset} alt="${group_name}" loading="lazy" decoding="async" style="width:300px;height:300px;object-fit:cover;"></div><div class="flip-card-back"><a href="${html_link}" target="_blank" style="color: #e6b800; text-decoration: none;"><h1>${group_name}</h1></a></div></div></div>
+                            <p><strong>Rank:</strong> ${rank}</p>
+                            <p><strong>Last Rank:</strong> ${last_rank_display}</p>
+                            <p><strong>Up Down:</strong> ${up_down_content}</p>
                         </div>
                     </td>
-                """
-            top_movers_rows += '</tr>'
-else:
-    top_movers_rows = '<tr><td>No significant rank changes</td></tr>'
-
-# Generate ranking HTML
-total_groups = len(sorted_data)
-table_rows = ''
-for entry in sorted_data:
-    group_name = escape(entry['group name'])
-    photo_src = entry['photo_file_name'] if entry['photo_file_name'] else 'https://via.placeholder.com/300'
-    html_link = f"HTML/{entry['html_file']}"
-    last_scene = f"{entry['Datedifference']} days" if entry['Datedifference'] != 'N/A' else 'N/A'
-    last_rank = entry['last rank']
-    last_rank_date = entry['last rank date']
-    last_rank_display = f"{last_rank} ({last_rank_date})" if last_rank != 'N/A' else 'N/A'
-    up_down = entry['up down']
-    # Add image based on up_down value
-    up_down_content = up_down
-    if up_down != 'N/A':
-        if up_down > 0:
-            up_down_content = f"{up_down} <img src='Photos/up.png' alt='Up' class='up-down-img'>"
-        elif up_down < 0:
-            up_down_content = f"{up_down} <img src='Photos/down.png' alt='Down' class='up-down-img'>"
-        else:  # up_down == 0
-            up_down_content = f"{up_down} <img src='Photos/0.png' alt='No Change' class='up-down-img'>"
-    table_rows += f"""
-    <tr>
-        <td>{entry['rank']}</td>
-        <td>{last_rank_display}</td>
-        <td>{up_down_content}</td>
-        <td><a href="{html_link}" target="_blank">{group_name}</a></td>
-        <td><div class="flip-card"><div class="flip-card-inner"><div class="flip-card-front"><img src="{photo_src}" alt="{group_name}" style="width:300px;height:300px;object-fit:cover;"></div><div class="flip-card-back"><a href="{html_link}" target="_blank" style="color: #e6b800; text-decoration: none;"><h1>{group_name}</h1></a></div></div></div></td>
-        <td>{last_scene}</td>
-        <td>{entry['total titles']}</td>
-        <td>{entry['count of the hashtag "#FIVE"']}</td>
-        <td>{entry['count of the hashtag "#FOUR"']}</td>
-        <td>{entry['count of the hashtag "#Three"']}</td>
-        <td>{entry['count of the hashtag "#SceneType"']}</td>
-        <td>{entry['score']:.2f}</td>
-    </tr>
-    """
-
-ranking_html_content = f"""<!DOCTYPE html>
+                """)
+
+# Index page
+ranking_page_template = Template("""<!DOCTYPE html>
 <html lang="en">
 <head>
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
-    <title>PS Ranking - {current_date}</title>
-    <style>
-        body {{ font-family: Arial, sans-serif; background-color: #1e2a44; color: #ffffff; margin: 20px; text-align: center; }}
-        h1, h2 {{ color: #e6b800; }}
-        table {{ width: 80%; margin: 20px auto; border-collapse: collapse; background-color: #2a3a5c; box-shadow: 0 0 10px rgba(0, 0, 0, 0.3); }}
-        th, td {{ border: 1px solid #3b4a6b; text-align: center; vertical-align: middle; padding: 15px; color: #ffffff; }}
-        th {{ background-color: #e6b800; color: #1e2a44; cursor: pointer; }}
-        th:hover {{ background-color: #b30000; }}
-        tr:hover {{ background-color: #3b4a6b; }}
-        .up-down-img {{ width: 20px; height: 20px; vertical-align: middle; }}
-        a {{ text-decoration: none; color: #e6b800; }}
-        a:hover {{ color: #b30000; text-decoration: underline; }}
-        .flip-card {{ background-color: transparent; width: 300px; height: 300px; perspective: 1000px; margin: 10px auto; }}
-        .flip-card-inner {{ position: relative; width: 100%; height: 100%; text-align: center; transition: transform 0.6s; transform-style: preserve-3d; box-shadow: 0 4px 8px 0 rgba(0,0,0,0.2); }}
-        .flip-card:hover .flip-card-inner {{ transform: rotateY(180deg); }}
-        .flip-card-front, .flip-card-back {{ position: absolute; width: 100%; height: 100%; backface-visibility: hidden; border-radius: 5px; }}
-        .flip-card-front {{ background-color: #2a3a5c; color: #ffffff; }}
-        .flip-card-back {{ background-color: #3b4a6b; color: #e6b800; transform: rotateY(180deg); display: flex; justify-content: center; align-items: center; flex-direction: column; }}
-        .flip-card-back h1 {{ margin: 0; font-size: 24px; word-wrap: break-word; padding: 10px; }}
-        .mover-info {{ display: flex; flex-direction: column; align-items: center; gap: 10px; width: 320px; }}
-        .mover-info p {{ margin: 5px 0; font-size: 16px; }}
-        #topMoversTable td {{ min-width: 340px; }}
-        @media only screen and (max-width: 1200px) {{ 
-            table {{ width: 90%; }} 
-            .flip-card {{ width: 200px; height: 200px; }} 
-            .flip-card-back h1 {{ font-size: 18px; }}
-            th, td {{ font-size: 14px; padding: 10px; }}
-            .mover-info {{ width: 220px; }}
-            .mover-info p {{ font-size: 14px; }}
-            #topMoversTable td {{ min-width: 240px; }}
-        }}
-        @media only screen and (max-width: 768px) {{ 
-            table {{ width: 95%; }} 
-            .flip-card {{ width: 150px; height: 150px; }} 
-            .flip-card-back h1 {{ font-size: 16px; }}
-            th, td {{ font-size: 12px; padding: 8px; }}
-            .mover-info {{ width: 170px; }}
-            .mover-info p {{ font-size: 12px; }}
-            #topMoversTable td {{ min-width: 190px; }}
-            #topMoversTable {{ display: block; overflow-x: auto; white-space: nowrap; }}
-        }}
-    </style>
+    <title>PS Ranking - ${current_date}</title>
+    <link rel="stylesheet" href="${index_css}">
 </head>
 <body>
-    <h1>PS Ranking - {current_date}</h1>
+    <h1>PS Ranking - ${current_date}</h1>
     <h2>Top Movers</h2>
     <table id="topMoversTable">
         <tbody>
-            {top_movers_rows}
+            ${top_movers_rows}
         </tbody>
     </table>
-    <h2>Total Number of Groups: {total_groups}</h2>
+    <h2>Total Number of Groups: ${total_groups}</h2>
     <table id="rankingTable">
         <thead>
             <tr>
@@ -950,71 +1351,749 @@ ranking_html_content = f"""<!DOCTYPE html>
                 <th onclick="sortTable(11)">Score</th>
             </tr>
         </thead>
-        <tbody id="tableBody">
-            {table_rows}
-        </tbody>
+        <tbody id="tableBody"></tbody>
     </table>
-    <script>
-        let sortDirections = [0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0];
-        function sortTable(columnIndex) {{
-            if (columnIndex === 4) return; // Skip Photo column
-            const tbody = document.getElementById('tableBody');
-            const rows = Array.from(tbody.getElementsByTagName('tr'));
-            const isNumeric = [true, true, true, false, false, true, true, true, true, true, true, true];
-            const direction = sortDirections[columnIndex] === 1 ? -1 : 1;
-
-            rows.sort((a, b) => {{
-                let aValue = a.cells[columnIndex].textContent;
-                let bValue = b.cells[columnIndex].textContent;
-
-                if (columnIndex === 1) {{ // Last Rank
-                    if (aValue === 'N/A' && bValue === 'N/A') return 0;
-                    if (aValue === 'N/A') return direction * 1;
-                    if (bValue === 'N/A') return direction * -1;
-                    // Extract rank from "rank (date)" format
-                    aValue = parseFloat(aValue.split(' ')[0]);
-                    bValue = parseFloat(bValue.split(' ')[0]);
-                    return direction * (aValue - bValue);
-                }} else if (columnIndex === 2) {{ // Up Down
-                    if (aValue === 'N/A' && bValue === 'N/A') return 0;
-                    if (aValue === 'N/A') return direction * 1;
-                    if (bValue === 'N/A') return direction * -1;
-                    aValue = parseFloat(aValue.split(' ')[0]);
-                    bValue = parseFloat(bValue.split(' ')[0]);
-                    return direction * (aValue - bValue);
-                }} else if (columnIndex === 5) {{ // Last Scene
-                    if (aValue === 'N/A' && bValue === 'N/A') return 0;
-                    if (aValue === 'N/A') return direction * 1;
-                    if (bValue === 'N/A') return direction * -1;
-                    aValue = parseInt(aValue);
-                    bValue = parseInt(bValue);
-                    return direction * (aValue - bValue);
-                }}
-
-                if (isNumeric[columnIndex]) {{ 
-                    aValue = parseFloat(aValue) || aValue; 
-                    bValue = parseFloat(bValue) || bValue; 
-                    return direction * (aValue - bValue); 
-                }}
-                return direction * aValue.localeCompare(bValue);
-            }});
-
-            while (tbody.firstChild) {{ 
-                tbody.removeChild(tbody.firstChild); 
-            }}
-            rows.forEach(row => tbody.appendChild(row));
-            sortDirections[columnIndex] = direction;
-            sortDirections = sortDirections.map((d, i) => i === columnIndex ? d : 0);
-        }}
-    </script>
+    <div class="pager">
+        <button id="prevPage" onclick="changePage(-1)">Previous</button>
+        <span id="pageInfo"></span>
+        <button id="nextPage" onclick="changePage(1)">Next</button>
+    </div>
+    <script type="application/json" id="rankingData">${ranking_data_json}</script>
+    <script src="${index_js}"></script>
 </body>
 </html>
-"""
+""")
+
+# Function to render the Videos tab of a group page as a list of HTML chunks
+def render_titles_grid(titles, telegram_group_id):
+    parts = [f"<p>Total Titles: {len(titles)}</p><div class='titles-grid' id='titlesGrid'>"]
+    append = parts.append
+    render_item = title_grid_item_template.compiled
+    for t in titles:
+        media_path = t['media_path']
+        media_element = (
+            f"<img src='{media_path}' alt='Media for {t['title']}' loading='lazy' decoding='async' style='width:100%;height:300px;object-fit:cover;border-radius:5px;'>"
+            if t['is_gif'] or media_path == 'https://via.placeholder.com/600x300'
+            else f"<video data-src='{media_path}' preload='none' style='width:100%;height:300px;object-fit:cover;border-radius:5px;' loop muted playsinline></video>"
+        )
+        append(render_item(media_element, telegram_group_id, t['message_id'], t['title'], t['serial_number'], t['date']))
+    append("</div>" if titles else f"<p>No titles found (Total: {len(titles)})</p>")
+    return parts
+
+# Function to render the Table tab of a group page as a list of HTML chunks
+def render_titles_table(titles, telegram_group_id):
+    parts = ["<table class='titles-table' id='titlesTable'><thead><tr><th onclick='sortTitlesTable(0)'>S.No</th><th onclick='sortTitlesTable(1)'>Items</th><th onclick='sortTitlesTable(2)'>Date</th></tr></thead><tbody id='titlesTableBody'>"]
+    for t in titles:
+        parts.append(f"<tr><td>{t['serial_number']}</td><td><a href='https://t.me/c/{telegram_group_id}/{t['message_id']}' target='_blank'>{t['title']}</a></td><td>{t['date']}</td></tr>")
+    parts.append("</tbody></table>" if titles else "<p>No titles found</p>")
+    return parts
+
+# Function to render a rank change with its up/down/unchanged icon
+def render_up_down(up_down):
+    if up_down == 'N/A':
+        return up_down
+    if up_down > 0:
+        return f"{up_down} <img src='Photos/up.png' alt='Up' class='up-down-img'>"
+    if up_down < 0:
+        return f"{up_down} <img src='Photos/down.png' alt='Down' class='up-down-img'>"
+    return f"{up_down} <img src='Photos/0.png' alt='No Change' class='up-down-img'>"
+
+# Per-group metrics kept between aggregation and rendering: everything scoring, ranking, the CSV
+# and the index page need, plus the chat's aggregate for rendering its page later. No rendered
+# HTML is held here, so memory doesn't grow with the size of the pages.
+class GroupRecord:
+    __slots__ = ('group_name', 'group_id', 'telegram_group_id', 'aggregator', 'total_messages', 'date_diff',
+                 'five_count', 'four_count', 'three_count', 'scene_type_count', 'titles_count',
+                 'last_rank', 'last_rank_date', 'html_file', 'photo_file_name', 'score', 'rank', 'up_down')
+
+    def __init__(self, group_name, group_id, aggregator):
+        hashtag_counts = aggregator.hashtag_counts
+        self.group_name = group_name
+        self.group_id = group_id
+        self.telegram_group_id = group_id[4:] if group_id.startswith('-100') else group_id
+        self.aggregator = aggregator
+        self.total_messages = aggregator.total_messages
+        self.date_diff = None
+        self.five_count = hashtag_counts.get('#FIVE', 0)
+        self.four_count = hashtag_counts.get('#FOUR', 0)
+        self.three_count = hashtag_counts.get('#THREE', 0)
+        self.scene_type_count = sum(hashtag_counts.get(h, 0) for h in special_scene_types)
+        self.titles_count = len(aggregator.topics)
+        self.last_rank = 'N/A'
+        self.last_rank_date = 'N/A'
+        self.html_file = f"{sanitize_filename(group_name)}_{group_id}.html"
+        self.photo_file_name = None
+        self.score = 0
+        self.rank = 0
+        self.up_down = 'N/A'  # Will be calculated after ranking
+
+    def csv_row(self, date):
+        return {
+            'date': date,
+            'group name': self.group_name,
+            'rank': self.rank,
+            'last rank': self.last_rank,
+            'up down': self.up_down,
+            'total messages': self.total_messages,
+            'Datedifference': self.date_diff if self.date_diff is not None else 'N/A',
+            'count of the hashtag "#FIVE"': self.five_count,
+            'count of the hashtag "#FOUR"': self.four_count,
+            'count of the hashtag "#Three"': self.three_count,
+            'count of the hashtag "#SceneType"': self.scene_type_count,
+            'score': self.score,
+            'total titles': self.titles_count
+        }
+
+# Function to read the peak RSS in MB of this process so far, or of its largest finished child
+# process (such as the --jobs workers), or None where resource is unavailable
+def peak_rss_mb(children=False):
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1 << 20 if sys.platform == 'darwin' else 1 << 10), 1)  # bytes on macOS, KiB elsewhere
+
+# Highest tracemalloc peak since the current stage began, kept when a group measurement
+# resets the peak
+carried_traced_peak = 0
+
+# Function to start measuring a stage or a group. Returns the clocks, the process's peak RSS
+# and the traced memory, whose peak is reset so it covers only what follows.
+def start_measure(stage=False):
+    global carried_traced_peak
+    carried_traced_peak = 0 if stage else max(carried_traced_peak, tracemalloc.get_traced_memory()[1])
+    tracemalloc.reset_peak()
+    return time.perf_counter(), time.process_time(), peak_rss_mb(), tracemalloc.get_traced_memory()[0]
+
+# Function to finish a measurement: wall and CPU seconds, how far it raised the process's peak
+# RSS and, with --trace-memory, the peak MB of Python allocations above where it started
+def stop_measure(mark, stage=False):
+    wall, cpu, rss, traced = mark
+    rss_after = peak_rss_mb()
+    measure = {
+        'wall_s': time.perf_counter() - wall,
+        'cpu_s': time.process_time() - cpu,
+        'rss_growth_mb': round(rss_after - rss, 1) if rss is not None else None
+    }
+    if tracemalloc.is_tracing():
+        peak = tracemalloc.get_traced_memory()[1]
+        if stage:
+            peak = max(peak, carried_traced_peak)
+        measure['traced_peak_mb'] = round((peak - traced) / (1 << 20), 1)
+    return measure
+
+# Wall time, CPU time and memory of each build stage and of each group's aggregation and
+# rendering. Stages run back to back: starting one ends the previous one. Stage figures are this
+# process's; groups rendered in worker processes are measured by the worker. RSS growth is how
+# far a stage or group raised its process's peak RSS, so anything below an earlier peak shows as
+# 0; --trace-memory adds the exact peak of Python allocations, at a large cost in speed.
+class BuildReport:
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.stages = []
+        self.groups = {}
+        self.current = None
+
+    def stage(self, name):
+        self.end_stage()
+        self.current = (name, start_measure(stage=True))
+
+    def end_stage(self):
+        if self.current:
+            name, mark = self.current
+            measure = stop_measure(mark, stage=True)
+            self.stages.append({'stage': name, **{key: round(value, 3) if key.endswith('_s') else value for key, value in measure.items()}})
+            self.current = None
+
+    def group(self, group_name, step, measure):
+        entry = self.groups.setdefault(group_name, {'group': group_name})
+        for key, value in measure.items():
+            entry[f'{step}_{key}'] = round(value, 4) if key.endswith('_s') else value
+
+    # End the last stage, write the report as JSON and print a summary of the stages and the
+    # slowest groups
+    def finish(self, path, slowest=5):
+        self.end_stage()
+        groups = sorted(self.groups.values(), key=lambda g: g.get('aggregate_wall_s', 0) + g.get('render_wall_s', 0), reverse=True)
+        report = {
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'total_wall_s': round(time.perf_counter() - self.started, 3),
+            'process_peak_rss_mb': peak_rss_mb(),
+            'children_peak_rss_mb': peak_rss_mb(children=True),
+            'stages': self.stages,
+            'groups': groups
+        }
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=1)
+        traced = tracemalloc.is_tracing()
+        logger.info("%-24s%10s%10s%10s%s", 'Stage', 'Wall s', 'CPU s', 'RSS +MB', f"{'Traced MB':>12}" if traced else '')
+        for stage in self.stages:
+            growth = stage['rss_growth_mb'] if stage['rss_growth_mb'] is not None else 'N/A'
+            logger.info("%-24s%10.3f%10.3f%10s%s", stage['stage'], stage['wall_s'], stage['cpu_s'], growth,
+                        f"{stage['traced_peak_mb']:>12}" if traced else '')
+        logger.info("%-24s%10.3f", 'total', report['total_wall_s'])
+        if report['process_peak_rss_mb'] is not None:
+            logger.info("Process lifetime peak RSS: %s MB, largest child process (such as --jobs workers): %s MB",
+                        report['process_peak_rss_mb'], report['children_peak_rss_mb'] or 'N/A')
+        if groups:
+            logger.info("%-40s%14s%12s", 'Slowest groups', 'Aggregate s', 'Render s')
+            for group in groups[:slowest]:
+                logger.info("%-40s%14.3f%12.3f", group['group'][:39], group.get('aggregate_wall_s', 0), group.get('render_wall_s', 0))
+        logger.info("Build report written to %s", path)
+
+# Function to measure fn(*args); returns its result and the measurement
+def timed(fn, *args):
+    mark = start_measure()
+    result = fn(*args)
+    return result, stop_measure(mark)
+
+# Function to aggregate one group's chat, measuring it for the build report
+def aggregate_group(group_name, group_id, messages, cached):
+    (aggregator, entry, status), measure = timed(aggregate_chat, messages, cached)
+    return group_name, group_id, aggregator, entry, status, measure
+
+# State shared by every task in a worker process, set once by init_worker instead of being
+# pickled with each task
+worker_state = {}
+
+def init_worker(photos_catalog, derivatives, media_names, log_level=logging.INFO, trace_memory=False):
+    logging.basicConfig(level=log_level, format='%(message)s', stream=sys.stdout)
+    if trace_memory and not tracemalloc.is_tracing():
+        tracemalloc.start()  # Workers that are spawned rather than forked don't inherit tracing
+    worker_state['photos_catalog'] = photos_catalog
+    worker_state['derivatives'] = derivatives
+    worker_state['media_names'] = media_names
+
+# Function to render a ranked group's page and write it if it changed; runs in a worker process
+# under --jobs. Returns the page path, whether it was written, its new output manifest entry and
+# the measurement of the work.
+def write_group_page(record, history, suggested_max, assets, manifest_entry):
+    html_path = os.path.join(html_subfolder, record.html_file)
+    manifest = {html_path: manifest_entry} if manifest_entry else {}
+    mark = start_measure()
+    html_content = render_group_page(record, worker_state['photos_catalog'], history, suggested_max, assets, worker_state['derivatives'], worker_state['media_names'])
+    written = write_if_changed(html_path, html_content, manifest)
+    return html_path, written, manifest.get(html_path), stop_measure(mark)
+
+# Function to run fn over argument tuples, on the executor if there is one, yielding results in
+# input order so the output does not depend on the number of workers. At most `window` tasks are
+# in flight, so streamed inputs are not all held in memory at once.
+def ordered_map(executor, fn, arg_tuples, window):
+    if executor is None:
+        for args in arg_tuples:
+            yield fn(*args)
+        return
+    pending = collections.deque()
+    for args in arg_tuples:
+        pending.append(executor.submit(fn, *args))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+# Function to render a ranked group's page
+def render_group_page(record, photos_catalog, history, suggested_max, assets, derivatives, media_names):
+    group_name = record.group_name
+    hashtag_counts = record.aggregator.hashtag_counts
+
+    # Hashtag lists
+    ratings_hashtag_list = ''.join(f'<li class="hashtag-item">{h}: {hashtag_counts[h]}</li>\n' for h in sorted(hashtag_counts) if h in special_ratings) or '<li>No rating hashtags (#FIVE, #FOUR, #Three) found</li>'
+    scene_types_hashtag_list = ''.join(f'<li class="hashtag-item">{h}: {hashtag_counts[h]}</li>\n' for h in sorted(hashtag_counts) if h in special_scene_types) or '<li>No scene type hashtags found</li>'
+    other_hashtag_list = ''.join(f'<li class="hashtag-item">{h}: {hashtag_counts[h]}</li>\n' for h in sorted(hashtag_counts) if h not in special_ratings and h not in special_scene_types) or '<li>No other hashtags found</li>'
+
+    date_diff_text = f'{record.date_diff} days' if record.date_diff is not None else 'N/A'
+
+    # Titles with serial numbers
+    titles = []
+    group_subfolder = os.path.join(docs_photos_folder, group_name)
+    thumbs_subfolder = os.path.join(group_subfolder, 'thumbs')
+    media_files = [f for f in photos_catalog.get(os.path.join(group_name, 'thumbs'), {}) if f.lower().endswith(tuple(media_extensions))]
+    fallback_photos = [f for f in photos_catalog.get(group_name, {}) if f.lower().endswith(photo_extensions)]
+    logger.debug("Group %s: Thumbs media files = %s, Fallback photos = %s", group_name, media_files, fallback_photos)
+    media_index = build_media_index(media_files)
+    for serial_number, topic in enumerate(record.aggregator.topics, 1):
+        title = topic['title']
+        media_path = 'https://via.placeholder.com/600x300'
+        is_gif = False
+        if media_files:
+            serial_match = find_serial_match_media(serial_number, media_index)
+            if serial_match:
+                media_path = '../' + published_photo(os.path.join(group_name, 'thumbs', serial_match), media_names)
+                is_gif = serial_match.lower().endswith('.gif')
+                logger.debug("Group %s, Title '%s' (S.No %d): Matched media '%s', selected path %s", group_name, title, serial_number, serial_match, media_path)
+        else:
+            logger.debug("Group %s, Title '%s' (S.No %d): No media files in %s", group_name, title, serial_number, thumbs_subfolder)
+            if fallback_photos:
+                fallback_photo = pick_fallback_photo(record.group_id, topic['message_id'], fallback_photos)
+                media_path = '../' + published_photo(os.path.join(group_name, fallback_photo), media_names)
+                is_gif = fallback_photo.lower().endswith('.gif')
+                logger.debug("  Using fallback photo: %s", media_path)
+        titles.append({
+            'title': title,
+            'message_id': topic['message_id'],
+            'date': topic['date'],
+            'media_path': media_path,
+            'is_gif': is_gif,
+            'serial_number': serial_number
+        })
+    titles.sort(key=lambda x: x['date'], reverse=True)  # Sort by date, newest first
+
+    # Titles grid and table
+    titles_grid = render_titles_grid(titles, record.telegram_group_id)
+    titles_table = render_titles_table(titles, record.telegram_group_id)
+
+    # Photos for slideshow
+    photo_paths = []
+    if group_name in photos_catalog:
+        photo_paths = ['../' + published_photo(os.path.join(group_name, f), media_names) for f in fallback_photos]
+        logger.debug("Group %s: Found %d photos in %s: %s", group_name, len(photo_paths), group_subfolder, photo_paths)
+        # The thumbnail strip shows resized derivatives, at most 100px wide
+        demo_images = [responsive_photo(os.path.join(group_name, f), 100, derivatives, media_names, '../') for f in fallback_photos]
+    if not photo_paths:
+        photo_paths = ['https://via.placeholder.com/1920x800']
+        demo_images = [(photo_paths[0], '')]
+        logger.debug("Group %s: Using placeholder for slideshow", group_name)
+
+    slideshow_content = '<div class="container">\n' + ''.join(f'<div class="mySlides"><div class="numbertext">{i} / {len(photo_paths)}</div><img {"src" if i == 1 else "data-src"}="{p}" style="width:100%;height:auto;"></div>' for i, p in enumerate(photo_paths, 1)) + """
+            <a class="prev" onclick="plusSlides(-1)">❮</a>
+            <a class="next" onclick="plusSlides(1)">❯</a>
+            <div class="caption-container"><p id="caption"></p></div>
+            <div class="row">
+        """ + ''.join(f'<div class="column"><img class="demo cursor" src="{src}"{srcset_attr(srcset)} loading="lazy" decoding="async" style="width:100%" onclick="currentSlide({i})" alt="{group_name} Photo {i}"></div>' for i, (src, srcset) in enumerate(demo_images, 1)) + '</div></div>'
+
+    return group_page_template.render(
+        group_name=group_name,
+        rank=record.rank,
+        column_width=100 / len(photo_paths) if photo_paths else 100,
+        slideshow_content=slideshow_content,
+        total_messages=record.total_messages,
+        date_diff_text=date_diff_text,
+        ratings_hashtag_list=ratings_hashtag_list,
+        scene_types_hashtag_list=scene_types_hashtag_list,
+        other_hashtag_list=other_hashtag_list,
+        titles_grid=titles_grid,
+        titles_table=titles_table,
+        history_data_json=json.dumps(history),
+        suggested_max=suggested_max,
+        group_css=assets['group_css'],
+        group_js=assets['group_js']
+    )
+
+# Function to describe a ranked group's metrics for the JSON API
+def api_group_summary(record):
+    return {
+        'id': record.group_id,
+        'name': record.group_name,
+        'rank': record.rank,
+        'last_rank': None if record.last_rank == 'N/A' else record.last_rank,
+        'last_rank_date': None if record.last_rank_date == 'N/A' else record.last_rank_date,
+        'up_down': None if record.up_down == 'N/A' else record.up_down,
+        'score': round(record.score, 2),
+        'total_messages': record.total_messages,
+        'date_diff': record.date_diff,
+        'five': record.five_count,
+        'four': record.four_count,
+        'three': record.three_count,
+        'scene_types': record.scene_type_count,
+        'titles': record.titles_count,
+        'page': f"HTML/{record.html_file}",
+        'api': f"api/groups/{record.group_id}.json"
+    }
+
+# Function to write a JSON API file, plus a gzip copy next to it when asked. The gzip header
+# carries no timestamp, so unchanged data gives byte-identical copies. Returns True if written.
+def write_api_file(path, data, manifest, gzip_copy):
+    content = json.dumps(data, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    written = write_if_changed(path, content, manifest)
+    if gzip_copy:
+        written = write_if_changed(path + '.gz', gzip.compress(content, mtime=0), manifest) or written
+    elif os.path.exists(path + '.gz'):
+        os.remove(path + '.gz')
+        manifest.pop(path + '.gz', None)
+    return written
+
+# Function to write docs/api/rankings.json and one docs/api/groups/<id>.json per group with its
+# metrics, hashtag counts, titles and full rank history, removing files of groups that are gone.
+# Returns the number of files written and unchanged.
+def write_api(sorted_data, history, current_date, manifest, gzip_copy):
+    os.makedirs(api_groups_folder, exist_ok=True)
+    written = unchanged = 0
+    rankings = {'date': current_date, 'total_groups': len(sorted_data), 'groups': [api_group_summary(entry) for entry in sorted_data]}
+    paths = {os.path.join(api_folder, 'rankings.json')}
+    if write_api_file(os.path.join(api_folder, 'rankings.json'), rankings, manifest, gzip_copy):
+        written += 1
+    else:
+        unchanged += 1
+    for entry in sorted_data:
+        path = os.path.join(api_groups_folder, f"{entry.group_id}.json")
+        paths.add(path)
+        group = api_group_summary(entry)
+        group['hashtags'] = dict(sorted(entry.aggregator.hashtag_counts.items()))
+        group['topics'] = [
+            {'serial_number': serial_number, 'title': topic['title'], 'date': topic['date'],
+             'url': f"https://t.me/c/{entry.telegram_group_id}/{topic['message_id']}"}
+            for serial_number, topic in enumerate(entry.aggregator.topics, 1)
+        ]
+        group['history'] = history.series(entry.group_name, current_date) + [{'date': current_date, 'rank': entry.rank}]
+        if write_api_file(path, group, manifest, gzip_copy):
+            written += 1
+        else:
+            unchanged += 1
+    for name in os.listdir(api_groups_folder):
+        path = os.path.join(api_groups_folder, name)
+        if path not in paths and path.removesuffix('.gz') not in paths:
+            os.remove(path)
+            manifest.pop(path, None)
+            logger.debug("Removed stale API file: %s", path)
+    return written, unchanged
+
+# Build the ranking and the docs/ site
+def main():
+    # Command-line options
+    parser = argparse.ArgumentParser(description='Rank PS groups from a Telegram export and build the docs/ site.')
+    parser.add_argument('--photo-sync', choices=['copy', 'hardlink', 'reflink'], default='copy',
+                        help='How new or changed files in Photos/ are published to docs/Photos/ (default: copy)')
+    parser.add_argument('--hashed-media', action='store_true',
+                        help='Publish the files of Photos/, except the rank change icons, under content-hashed names so they '
+                             'can be cached immutably; pages reference them through the sync manifest')
+    parser.add_argument('--dedup-media', action='store_true',
+                        help=f'Publish every file of Photos/ once per unique content, under a hashed name in '
+                             f'docs/Photos/{blobs_folder_name}/, and point all references at it')
+    parser.add_argument('--no-cache', action='store_true',
+                        help='Ignore cached per-chat aggregates and aggregate every chat from scratch')
+    parser.add_argument('--jobs', type=int, default=1,
+                        help='Worker processes for rendering group pages; 0 uses every CPU (default: 1)')
+    parser.add_argument('--chart-points', type=int, default=365,
+                        help='Most points in a group page\'s rank chart, downsampled from the full history; 0 keeps every point (default: 365)')
+    parser.add_argument('--compact-history', action='store_true',
+                        help='Merge duplicate same-day history rows, keeping the best rank, and rewrite history.csv')
+    parser.add_argument('--rank-only', action='store_true',
+                        help='Only compute the ranking and write output.csv and the history; skip Photos, media and HTML')
+    parser.add_argument('--weights', default='',
+                        help='Scoring weights overriding the defaults, e.g. "five=10,recency=5"; one of ' + ', '.join(scoring.feature_names))
+    parser.add_argument('--gzip-api', action='store_true',
+                        help='Also write a gzip-compressed .json.gz copy of every docs/api/ file')
+    parser.add_argument('--trace-memory', action='store_true',
+                        help='Also record the peak Python memory of every stage and group in the build report with '
+                             'tracemalloc; makes the build several times slower')
+    verbosity = parser.add_mutually_exclusive_group()
+    verbosity.add_argument('--quiet', '-q', action='store_true',
+                           help='Only log warnings and errors')
+    verbosity.add_argument('--verbose', '-v', action='store_true',
+                           help='Also log per-file and per-group detail')
+    args = parser.parse_args()
+    log_level = logging.WARNING if args.quiet else logging.DEBUG if args.verbose else logging.INFO
+    logging.basicConfig(level=log_level, format='%(message)s', stream=sys.stdout)
+    try:
+        weights = scoring.parse_weights(args.weights)
+    except ValueError as e:
+        parser.error(str(e))
+    if args.chart_points and args.chart_points < 3:
+        parser.error('--chart-points must be 0 or at least 3')
+    jobs = args.jobs or os.cpu_count() or 1
+    if args.trace_memory:
+        tracemalloc.start()
+    report = BuildReport()
+    report.stage('setup')
+
+    # Ensure directories exist
+    folders = [input_folder, output_folder, cache_folder] if args.rank_only else [input_folder, output_folder, html_subfolder, photos_folder, cache_folder]
+    for folder in folders:
+        if not os.path.exists(folder):
+            os.makedirs(folder)
+            logger.debug("Created directory: %s", folder)
+        else:
+            logger.debug("Directory already exists: %s", folder)
+
+    # With --rank-only nothing under Photos/, docs/Photos/ or docs/HTML/ is touched
+    if args.rank_only:
+        photos_catalog = None
+        derivatives = media_names = {}
+        logger.info("Rank-only run: skipping Photos sync, media and HTML")
+    else:
+        report.stage('photos sync')
+        # Catalog Photos/ once; docs/Photos/ mirrors it, so every group's media lookups use this catalog
+        photos_catalog = build_media_catalog(photos_folder)
+        logger.info("Catalogued %d files in %s/", sum(len(files) for files in photos_catalog.values()), photos_folder)
+
+        # Sync Photos/ to docs/Photos/
+        os.makedirs(docs_photos_folder, exist_ok=True)
+        naming = 'dedup' if args.dedup_media else 'hashed' if args.hashed_media else 'original'
+        copied, unchanged, deleted, saved_bytes, media_names = sync_tree(photos_catalog, photos_folder, docs_photos_folder,
+                                                                         photos_manifest_file, args.photo_sync, naming)
+        logger.info("Synced %s/ to %s/ (%s, %s names): %d copied, %d unchanged, %d deleted",
+                    photos_folder, docs_photos_folder, args.photo_sync, naming, copied, unchanged, deleted)
+        if naming != 'original':
+            logger.info("Deduplicated media: %.1f MB of duplicate files not published", saved_bytes / (1 << 20))
+
+        # Resized cover and slideshow photos for the index and the thumbnail strips
+        report.stage('photo derivatives')
+        derivatives = build_derivatives(photos_catalog, photos_folder, load_manifest(photos_manifest_file))
+
+    # Path to result.zip
+    zip_file = os.path.join(input_folder, 'result.zip')
+
+    # Verify ZIP file existence and locate result.json inside it
+    if not os.path.exists(zip_file):
+        logger.error("Error: 'result.zip' not found in '%s'. Exiting.", input_folder)
+        exit(1)
+
+    logger.info("Opening %s", zip_file)
+    try:
+        zip_ref = zipfile.ZipFile(zip_file, 'r')
+    except zipfile.BadZipFile:
+        logger.error("Error: '%s' is not a valid ZIP file. Exiting.", zip_file)
+        exit(1)
+    json_info = next((file_info for file_info in zip_ref.infolist() if file_info.filename.endswith('result.json')), None)
+    if json_info is None:
+        logger.error("Error: 'result.json' not found in '%s'. Exiting.", zip_file)
+        exit(1)
+
+    # Stream chats straight out of result.zip one at a time, so the decompressed export never touches disk
+    logger.info("Streaming chats from %s:%s", zip_file, json_info.filename)
+    json_fp = io.TextIOWrapper(zip_ref.open(json_info), encoding='utf-8')
+    chats = iter_json_array(json_fp, ('chats', 'list'))
+    total_chats = 0
+
+    # Per-chat aggregates from previous runs
+    aggregate_cache = {} if args.no_cache else load_aggregate_cache(aggregate_cache_file)
+    new_aggregate_cache = {}
+
+    # Rank history, imported from history.csv into the SQLite store on first use
+    report.stage('load history')
+    current_date = datetime.now().strftime('%Y-%m-%d')
+    history = HistoryStore(history_db_file, history_csv_file)
+    if args.compact_history:
+        logger.info("Compacted history: %d duplicate same-day or invalid rows removed from %s", history.compact(), history_csv_file)
+
+    # Initialize data storage
+    all_data = []
+
+    # Supergroup chats in export order, with their cached aggregates
+    def group_chats():
+        nonlocal total_chats
+        for chat in chats:
+            total_chats += 1
+            if chat.get('type') == 'private_supergroup':
+                group_id = str(chat['id'])
+                yield chat.get('name', 'Unknown Group'), group_id, chat.get('messages', []), aggregate_cache.get(group_id)
+
+    # Phase 1: aggregate each chat into a lightweight record; no HTML is rendered yet. This
+    # stage includes reading and parsing result.zip, which is streamed as chats are consumed.
+    # Chats are aggregated in this process even under --jobs: a decoded chat costs more to
+    # pickle to a worker than to aggregate, and only one chat is held at a time.
+    report.stage('read and aggregate')
+    for group_name, group_id, aggregator, aggregate_entry, cache_status, measure in (aggregate_group(*chat) for chat in group_chats()):
+        report.group(group_name, 'aggregate', measure)
+        logger.debug("Processing group: %s (ID: %s)", group_name, group_id)
+
+        # Each chat is aggregated in a single pass over its messages, or only over the
+        # messages that are new since the cached aggregate
+        new_aggregate_cache[group_id] = aggregate_entry
+        logger.debug("Group %s: Aggregated (%s)", group_name, cache_status)
+        record = GroupRecord(group_name, group_id, aggregator)
+
+        # Calculate date_diff
+        if aggregator.newest_date is not None:
+            today = datetime.now()
+            record.date_diff = (today - aggregator.newest_date).days
+        logger.debug("Group %s: Total messages = %d, Date diff = %s", group_name, record.total_messages, record.date_diff)
+
+        if photos_catalog is not None:
+            photo_file_name = next((f"{group_name}{ext}" for ext in photo_extensions if f"{group_name}{ext}" in photos_catalog.get('', {})), None)
+            if photo_file_name:
+                record.photo_file_name = f"Photos/{photo_file_name}"
+                logger.debug("Group %s: Found single photo at %s/%s", group_name, docs_photos_folder, photo_file_name)
+            else:
+                logger.debug("Group %s: No single photo found in %s/", group_name, docs_photos_folder)
+
+        # Find last rank and its date, not counting earlier runs today
+        last_rank = history.last_rank(group_name, current_date)
+        if last_rank:
+            record.last_rank, record.last_rank_date = last_rank
+
+        all_data.append(record)
+
+    json_fp.close()
+    zip_ref.close()
+    save_aggregate_cache(aggregate_cache_file, new_aggregate_cache)
+    logger.info("Found %d chats in result.json", total_chats)
+
+    if not total_chats:
+        logger.error("No chats found in 'result.json'. Exiting.")
+        exit(1)
+
+    # Calculate scores from the groups' metric columns
+    report.stage('score and rank')
+    columns = {
+        'five': [entry.five_count for entry in all_data],
+        'four': [entry.four_count for entry in all_data],
+        'three': [entry.three_count for entry in all_data],
+        'scene_types': [entry.scene_type_count for entry in all_data],
+        'titles': [entry.titles_count for entry in all_data],
+        'total_messages': [entry.total_messages for entry in all_data],
+        'date_diff': [entry.date_diff for entry in all_data]
+    }
+    for entry, score in zip(all_data, scoring.score(columns, weights)):
+        entry.score = score
+
+    # Sort by score and assign ranks
+    sorted_data = sorted(all_data, key=lambda x: x.score, reverse=True)
+    for i, entry in enumerate(sorted_data, 1):
+        entry.rank = i
+        # Calculate up down (last_rank - rank)
+        if entry.last_rank != 'N/A':
+            entry.up_down = int(entry.last_rank) - i
+
+    # Write current run to output.csv
+    report.stage('csv and history')
+    csv_data = [entry.csv_row(current_date) for entry in sorted_data]
+    with open(csv_file, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=csv_columns)
+        writer.writeheader()
+        writer.writerows(csv_data)
+    logger.info("Wrote CSV file: %s", csv_file)
+
+    # Append new history entries to the history store and history.csv
+    new_history_rows = [(current_date, entry.group_name, entry.rank) for entry in sorted_data if entry.group_name]
+    if new_history_rows:
+        history.append(new_history_rows)
+        logger.info("Appended %d rows to %s", len(new_history_rows), history_csv_file)
+    else:
+        logger.info("No new history entries to append to %s", history_csv_file)
+
+    if args.rank_only:
+        history.close()
+        logger.info("Ranked %d groups. Output written to %s and %s", total_chats, csv_file, history_csv_file)
+        report.finish(build_report_file)
+        return
+
+    # Generated pages are only rewritten when their content changed
+    output_manifest = load_manifest(output_manifest_file)
+    html_written = html_skipped = 0
+
+    # Shared page styles and scripts are published once under content-hashed names
+    report.stage('assets')
+    assets = {
+        'group_css': publish_asset('group', 'css', group_page_css, output_manifest),
+        'group_js': publish_asset('group', 'js', group_page_js, output_manifest),
+        'index_css': publish_asset('index', 'css', index_page_css, output_manifest),
+        'index_js': publish_asset('index', 'js', index_page_js, output_manifest)
+    }
+
+    # Phase 2: render each group page once, already knowing its rank, and write it straight out.
+    # With --jobs, pages are rendered in worker processes; results are consumed in rank order, so
+    # the output is the same for any number of workers.
+    report.stage('render pages')
+    executor = ProcessPoolExecutor(max_workers=jobs, initializer=init_worker, initargs=(photos_catalog, derivatives, media_names, log_level, args.trace_memory)) if jobs > 1 else None
+    if executor is None:
+        init_worker(photos_catalog, derivatives, media_names, log_level, args.trace_memory)
+    window = jobs * 2
+    page_jobs = ((entry, downsample_series(history.series(entry.group_name, current_date), args.chart_points), total_chats + 1, assets,
+                  output_manifest.get(os.path.join(html_subfolder, entry.html_file))) for entry in sorted_data)
+    for entry, (html_path, written, manifest_entry, measure) in zip(sorted_data, ordered_map(executor, write_group_page, page_jobs, window)):
+        report.group(entry.group_name, 'render', measure)
+        if manifest_entry:
+            output_manifest[html_path] = manifest_entry
+        if written:
+            html_written += 1
+            logger.debug("Wrote HTML file: %s", html_path)
+        else:
+            html_skipped += 1
+            logger.debug("Unchanged HTML file: %s", html_path)
+    if executor is not None:
+        executor.shutdown()
+
+    # JSON API for consumers that only need the data
+    report.stage('json api')
+    api_written, api_unchanged = write_api(sorted_data, history, current_date, output_manifest, args.gzip_api)
+    logger.info("API files: %d written, %d unchanged in %s/", api_written, api_unchanged, api_folder)
+    history.close()
+
+    # Cover photos for the 300px flip cards, resized when derivatives exist
+    report.stage('index page')
+    covers = {
+        entry.group_id: responsive_photo(entry.photo_file_name.removeprefix('Photos/'), 300, derivatives, media_names)
+        if entry.photo_file_name else ('https://via.placeholder.com/300', '')
+        for entry in sorted_data
+    }
+
+    # Generate top 5 up, down, and unchanged table
+    up_groups = [entry for entry in sorted_data if entry.up_down != 'N/A' and entry.up_down > 0]
+    down_groups = [entry for entry in sorted_data if entry.up_down != 'N/A' and entry.up_down < 0]
+    unchanged_groups = [entry for entry in sorted_data if entry.up_down == 0]
+
+    # Sort by up_down (primary) and rank (secondary, ascending for higher rank)
+    up_groups = sorted(up_groups, key=lambda x: (x.up_down, -x.rank), reverse=True)[:5]
+    down_groups = sorted(down_groups, key=lambda x: (x.up_down, -x.rank), reverse=True)[:5]
+    unchanged_groups = sorted(unchanged_groups, key=lambda x: x.rank)[:5]  # Sort by rank ascending
+
+    top_movers_rows = []
+    if up_groups or down_groups or unchanged_groups:
+        for group_list, title in [(up_groups, 'Top 5 Up'), (down_groups, 'Top 5 Down'), (unchanged_groups, 'Top 5 Unchanged')]:
+            if group_list:
+                top_movers_rows.append(f'<tr><th style="background-color: #b30000;">{title}</th></tr><tr>')
+                for entry in group_list:
+                    mover_cell_template.render_into(
+                        top_movers_rows,
+                        group_name=escape(entry.group_name),
+                        photo_src=covers[entry.group_id][0],
+                        photo_srcset=srcset_attr(covers[entry.group_id][1]),
+                        html_link=f"HTML/{entry.html_file}",
+                        rank=entry.rank,
+                        last_rank_display=f"{entry.last_rank} ({entry.last_rank_date})" if entry.last_rank != 'N/A' else 'N/A',
+                        up_down_content=render_up_down(entry.up_down)
+                    )
+                top_movers_rows.append('</tr>')
+    else:
+        top_movers_rows.append('<tr><td>No significant rank changes</td></tr>')
+
+    # Ranking table dataset; the index page renders and sorts its rows client-side
+    total_groups = len(sorted_data)
+    ranking_rows = [{
+        'rank': entry.rank,
+        'lastRank': None if entry.last_rank == 'N/A' else entry.last_rank,
+        'lastRankDate': None if entry.last_rank_date == 'N/A' else entry.last_rank_date,
+        'upDown': None if entry.up_down == 'N/A' else entry.up_down,
+        'name': entry.group_name,
+        'page': f"HTML/{entry.html_file}",
+        'photo': covers[entry.group_id][0],
+        'photoSrcset': covers[entry.group_id][1],
+        'lastScene': entry.date_diff,
+        'titles': entry.titles_count,
+        'five': entry.five_count,
+        'four': entry.four_count,
+        'three': entry.three_count,
+        'sceneTypes': entry.scene_type_count,
+        'score': f"{entry.score:.2f}",
+        'scoreValue': entry.score
+    } for entry in sorted_data]
+    # Keep "</" out of the embedded JSON so it cannot close the script element
+    ranking_data_json = json.dumps(ranking_rows, ensure_ascii=False, separators=(',', ':')).replace('</', '<\\/')
+
+    ranking_html_content = ranking_page_template.render(
+        current_date=current_date,
+        top_movers_rows=top_movers_rows,
+        total_groups=total_groups,
+        ranking_data_json=ranking_data_json,
+        index_css=assets['index_css'],
+        index_js=assets['index_js']
+    )
+
+    # Write ranking HTML file
+    ranking_html_file = os.path.join(output_folder, 'index.html')
+    if write_if_changed(ranking_html_file, ranking_html_content, output_manifest):
+        html_written += 1
+        logger.debug("Wrote ranking HTML file: %s", ranking_html_file)
+    else:
+        html_skipped += 1
+        logger.debug("Unchanged ranking HTML file: %s", ranking_html_file)
+    with open(output_manifest_file, 'w', encoding='utf-8') as f:
+        json.dump(output_manifest, f)
+    logger.info("HTML files: %d written, %d unchanged", html_written, html_skipped)
 
-# Write ranking HTML file
-ranking_html_file = os.path.join(output_folder, 'index.html')
-with open(ranking_html_file, 'w', encoding='utf-8') as f:
-    f.write(ranking_html_content)
-print(f"\nWrote ranking HTML file: {ranking_html_file}")
+    logger.info("Processed %d groups. Output written to %s", total_chats, output_folder)
+    report.finish(build_report_file)
 
-print(f"\nProcessed {len(chats)} groups. Output written to {output_folder}")
\ No newline at end of file
+if __name__ == '__main__':
+    main()
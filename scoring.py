@@ -0,0 +1,114 @@
+import argparse
+import csv
+import json
+import sys
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+# Scoring features in the order their weighted terms are summed. The raw counts are used as is,
+# 'messages' is the message count divided by the largest one and 'recency' maps the days since a
+# group's newest message onto 1 (most recent) .. 0 (least recent), or 0 when it has no messages.
+feature_names = ('five', 'four', 'three', 'scene_types', 'titles', 'messages', 'recency')
+
+# The ranking rank.py publishes: 10 x #FIVE + 5 x #FOUR + #THREE + 10 x messages + 10 x recency
+default_weights = {'five': 10, 'four': 5, 'three': 1, 'scene_types': 0, 'titles': 0, 'messages': 10, 'recency': 10}
+
+# Per-group metrics as columns, one list per key, all in the same group order
+column_names = ('five', 'four', 'three', 'scene_types', 'titles', 'total_messages', 'date_diff')
+
+# Function to parse weights like "five=10,recency=5" on top of the default weights
+def parse_weights(text, base=None):
+    weights = dict(base or default_weights)
+    for item in filter(None, (part.strip() for part in text.split(','))):
+        name, sep, value = item.partition('=')
+        name = name.strip()
+        if not sep or name not in feature_names:
+            raise ValueError(f"Invalid weight '{item}': expected NAME=NUMBER with NAME one of {', '.join(feature_names)}")
+        weights[name] = float(value)
+    return weights
+
+# Function to turn metric columns into feature columns: raw counts as they are, 'messages' and
+# 'recency' normalized across all groups
+def features(columns):
+    total_messages = columns['total_messages']
+    date_diffs = [d for d in columns['date_diff'] if d is not None]
+    max_messages = max(total_messages, default=0)
+    min_date_diff = min(date_diffs) if date_diffs else 0
+    max_date_diff_denom = max(date_diffs) - min_date_diff if date_diffs and max(date_diffs) > min_date_diff else 1
+    result = {name: columns[name] for name in feature_names[:5]}
+    result['messages'] = [m / max_messages if max_messages > 0 else 0.0 for m in total_messages]
+    result['recency'] = [1 - (d - min_date_diff) / max_date_diff_denom if d is not None else 0.0 for d in columns['date_diff']]
+    return result
+
+# Function to score every group under each of several weight sets at once. Returns one list of
+# scores per weight set, in the same order. With NumPy the terms are computed for all weight sets
+# and groups together; the pure-Python path gives the same floats, term by term.
+def score_batch(columns, weight_sets):
+    feature_columns = features(columns)
+    if np is not None:
+        weights = np.array([[float(w.get(name, 0)) for name in feature_names] for w in weight_sets], dtype=np.float64)
+        scores = np.zeros((len(weight_sets), len(columns['total_messages'])), dtype=np.float64)
+        for k, name in enumerate(feature_names):
+            scores += weights[:, k, None] * np.asarray(feature_columns[name], dtype=np.float64)[None, :]
+        return scores.tolist()
+    results = []
+    for w in weight_sets:
+        scores = [0.0] * len(columns['total_messages'])
+        for name in feature_names:
+            weight = float(w.get(name, 0))
+            scores = [s + weight * f for s, f in zip(scores, feature_columns[name])]
+        results.append(scores)
+    return results
+
+def score(columns, weights=None):
+    return score_batch(columns, [weights or default_weights])[0]
+
+# Function to rank scores: 1 for the highest, ties keep their input order
+def rank_order(scores):
+    ranks = [0] * len(scores)
+    for rank, index in enumerate(sorted(range(len(scores)), key=lambda i: scores[i], reverse=True), 1):
+        ranks[index] = rank
+    return ranks
+
+# Function to read metric columns and group names back from a rank.py output.csv
+def read_output_csv(path):
+    names = []
+    columns = {name: [] for name in column_names}
+    with open(path, 'r', encoding='utf-8') as f:
+        for row in csv.DictReader(f):
+            names.append(row['group name'])
+            columns['five'].append(int(row['count of the hashtag "#FIVE"']))
+            columns['four'].append(int(row['count of the hashtag "#FOUR"']))
+            columns['three'].append(int(row['count of the hashtag "#Three"']))
+            columns['scene_types'].append(int(row['count of the hashtag "#SceneType"']))
+            columns['titles'].append(int(row['total titles']))
+            columns['total_messages'].append(int(row['total messages']))
+            columns['date_diff'].append(None if row['Datedifference'] == 'N/A' else int(row['Datedifference']))
+    return names, columns
+
+# Compare rankings under alternative weights using the metrics of an earlier run, without
+# rerunning rank.py
+def main():
+    parser = argparse.ArgumentParser(description='Rank the groups of a rank.py output.csv under several weight variants.')
+    parser.add_argument('variants', help='JSON file mapping variant names to weights, e.g. {"more recency": {"recency": 30}}; '
+                                         'weights not given keep their defaults')
+    parser.add_argument('--input', default='docs/output.csv', help='output.csv to read metrics from (default: docs/output.csv)')
+    args = parser.parse_args()
+
+    with open(args.variants, 'r', encoding='utf-8') as f:
+        variants = {'default': dict(default_weights)}
+        variants.update((name, {**default_weights, **weights}) for name, weights in json.load(f).items())
+    names, columns = read_output_csv(args.input)
+    all_scores = score_batch(columns, list(variants.values()))
+    all_ranks = [rank_order(scores) for scores in all_scores]
+
+    writer = csv.writer(sys.stdout)
+    writer.writerow(['group name'] + [f'{name} rank' for name in variants] + [f'{name} score' for name in variants])
+    for i in sorted(range(len(names)), key=lambda i: all_ranks[0][i]):
+        writer.writerow([names[i]] + [ranks[i] for ranks in all_ranks] + [f'{scores[i]:.2f}' for scores in all_scores])
+
+if __name__ == '__main__':
+    main()